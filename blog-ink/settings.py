@@ -17,7 +17,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
+from core.db_connections import configure_connections
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,11 @@ for django final(module 28): blog-ink_avatars, blog-ink_post_image
 """
 
 
+# orphaned images are queued in core.OrphanedImage and deleted in bulk by `manage.py drain_image_queue`
+# set to 'core.image_cleanup.StubCloudinaryClient' to run the queue offline
+IMAGE_CLEANUP_CLIENT = config('IMAGE_CLEANUP_CLIENT', default='core.image_cleanup.CloudinaryClient')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -98,6 +104,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware', # safe-method reads from replicas, sticky primary after writes
+    'core.query_budget.QueryBudgetMiddleware', # per-request query count / N+1 detector
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -147,6 +155,90 @@ DATABASES = {
     }
 }
 
+# connection reuse on Vercel (core/db_connections.py): DB_CONNECTION_MODE = per_request | persistent | pool.
+# a warm instance keeps its connection DB_CONN_MAX_AGE seconds (health-checked) instead of a new TLS connection per request.
+# DB_TRANSACTION_POOLER=True when HOST/PORT point at a transaction-mode pooler (Supabase pooler port 6543, PgBouncer).
+# `python manage.py benchmark_db_connections` compares the modes against the configured database
+DATABASES['default'] = configure_connections(
+    DATABASES['default'],
+    mode=config('DB_CONNECTION_MODE', default='persistent'),
+    max_age=config('DB_CONN_MAX_AGE', default=60, cast=int),
+    transaction_pooler=config('DB_TRANSACTION_POOLER', default=False, cast=bool),
+)
+
+# read replicas (core/db_router.py): reads of GET/HEAD/OPTIONS requests go to a replica, writes and the client's
+# reads for REPLICA_STICKY_SECONDS after a write stay on the primary. a replica more than REPLICA_MAX_LAG_SECONDS
+# behind (checked every REPLICA_LAG_CHECK_SECONDS) is skipped. DATABASE_REPLICA_HOSTS=host1,host2 adds one alias per
+# host with the primary's credentials; leave it empty to send everything to the primary.
+for _i, _host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{_i}'] = {**DATABASES['default'], 'HOST': _host, 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=2, cast=float)
+REPLICA_LAG_CHECK_SECONDS = config('REPLICA_LAG_CHECK_SECONDS', default=5, cast=float)
+REPLICA_PIN_CACHE_ALIAS = 'default' # share it between workers (e.g. file or redis cache) or pins only hold per process
+
+
+
+# Cache
+# 'responses' holds the serialized public list pages (see core/response_cache.py), off by default.
+# it needs a backend every worker shares, it stays off with locmem: set RESPONSE_CACHE_ENABLED=True plus e.g.
+# RESPONSE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and RESPONSE_CACHE_LOCATION=redis://...
+# (FileBasedCache with RESPONSE_CACHE_LOCATION=/tmp/blog-ink-cache is shared by the workers of one host only,
+# not by Vercel instances).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-ink-default',
+    },
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='blog-ink-responses'),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=False, cast=bool)
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=60, cast=int) # seconds, also bounds like/comment count staleness
+
+
+# query budget (core/query_budget.py): logs a warning for requests over budget or with repeated identical SQL (N+1)
+# views override the default with `query_budget = N` (QueryBudgetMixin), report at /api/v1/queries/report/
+# on in development, set QUERY_BUDGET_ENABLED=True to sample production
+QUERY_BUDGET = {
+    'ENABLED': config('QUERY_BUDGET_ENABLED', default=DEBUG, cast=bool),
+    'DEFAULT': config('QUERY_BUDGET_DEFAULT', default=30, cast=int),
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'RAISE': False, # never turn an over-budget response into a 500, tests may set it
+}
+
+
+# payment gateway client (payment/gateway.py): one pooled session per process, timeouts and a circuit breaker
+# so a slow or failing SSLCommerz cannot tie up web workers. TRANSPORT 'payment.gateway.FakeTransport' for offline use
+PAYMENT_GATEWAY = {
+    'TRANSPORT': config('PAYMENT_GATEWAY_TRANSPORT', default='payment.gateway.RequestsTransport'),
+    'CONNECT_TIMEOUT': config('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05, cast=float),
+    'READ_TIMEOUT': config('PAYMENT_GATEWAY_READ_TIMEOUT', default=10, cast=float),
+    'POOL_MAXSIZE': 10,
+    'FAILURE_THRESHOLD': 5, # consecutive failures before the circuit opens
+    'RESET_TIMEOUT': 30, # seconds the circuit stays open before one trial call
+}
+
+
+# subscriptions (payment/entitlements.py): one payment buys SUBSCRIPTION_DAYS of premium access,
+# entitlement lookups are cached per process. run `python manage.py expire_subscriptions` periodically (cron)
+SUBSCRIPTION_DAYS = config('SUBSCRIPTION_DAYS', default=30, cast=int)
+ENTITLEMENT_CACHE_TTL = config('ENTITLEMENT_CACHE_TTL', default=300, cast=int)
+
+
+# trending posts (blogs/trending.py): a like or comment loses half its weight every TRENDING_HALF_LIFE_HOURS.
+# run `python manage.py recompute_post_scores` periodically to fold in unlikes and deleted comments
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+
+
+# staff exports (core/export.py, /posts/export/ and /payments/export/): rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
 
 
 # Password validation
@@ -186,7 +278,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-		'rest_framework_simplejwt.authentication.JWTAuthentication', # ---
+		config('JWT_AUTHENTICATION_CLASS', default='rest_framework_simplejwt.authentication.JWTAuthentication'), # 'users.authentication.StatelessJWTAuthentication' skips the per-request user SELECT
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
@@ -219,8 +311,15 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ClaimsTokenObtainPairSerializer', # adds username, is_staff, is_subscribed, is_active, auth_version claims
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.ClaimsTokenRefreshSerializer',
 }
 
+# StatelessJWTAuthentication checks the token's auth_version against this cache (one key per user).
+# with a per-process cache (locmem) another instance notices a change after at most AUTH_VERSION_CACHE_TTL seconds
+AUTH_VERSION_CACHE_ALIAS = 'default'
+AUTH_VERSION_CACHE_TTL = config('AUTH_VERSION_CACHE_TTL', default=60, cast=int)
+
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173') # for email, change after deploying react frontend 
 BACKEND_URL = config("BACKEND_URL", default='http://127.0.0.1:8000/') # used in payment.views for sslcommerz
 
@@ -273,8 +372,12 @@ CORS_ALLOW_CREDENTIALS = True
 
 
 # for sending email
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-#EMAIL_BACKEND = 'users.email_backends.CustomEmailBackend'
+# sent inline over SMTP by default (Vercel runs no worker or cron that could drain a queue).
+# where a worker runs `python manage.py send_queued_email --loop`, set EMAIL_BACKEND=users.email_backends.QueuedEmailBackend:
+# requests then only queue the message (core.QueuedEmail) and the worker delivers it through QUEUED_EMAIL_DELIVERY_BACKEND
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+QUEUED_EMAIL_DELIVERY_BACKEND = config('QUEUED_EMAIL_DELIVERY_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+#QUEUED_EMAIL_DELIVERY_BACKEND = 'users.email_backends.CustomEmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
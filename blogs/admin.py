@@ -3,10 +3,11 @@ from .models import BlogPost, Comment, Like
 
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
-    list_display  = ("id", "title", "author", "category", "created_at", "is_active", "is_premium",)
+    list_display  = ("id", "title", "author", "category", "created_at", "is_active", "is_premium", "like_count", "comment_count",)
     list_filter   = ("category", "created_at", "is_active", "is_premium",)
     search_fields = ("title", "body")
     raw_id_fields = ("author", "category")
+    readonly_fields = ("like_count", "comment_count")
     
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -0,0 +1,119 @@
+# blogs, author_stats.py:
+# incremental upkeep of AuthorStats (an author's active posts, likes and comments received, latest post).
+# every change is a single UPDATE with F(); only losing the latest post re-reads one row.
+# a post's like / comment counters are read from its row inside the UPDATE: the instance's copies are stale
+# as soon as a like or comment bumped them with F(). deletes are handled in pre_delete, while that row still exists.
+# comments removed by a post delete cascade are subtracted one by one by the Comment post_delete signal,
+# so post removal only takes away the post itself and its likes (Like rows are fast-deleted, no signals).
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import AuthorStats, BlogPost
+
+
+def _minus(field, amount):
+    return Greatest(F(field) - amount, Value(0))  # never below zero, even if the rollup drifted
+
+
+def _stored(post, field):
+    """The post's counter as stored in its row."""
+    return Coalesce(Subquery(BlogPost.objects.filter(pk=post.pk).values(field)), 0)
+
+
+def ensure_author_stats(author_id):
+    AuthorStats.objects.bulk_create([AuthorStats(user_id=author_id)], ignore_conflicts=True)
+
+
+def post_added(post):
+    """A post became visible (created active, or re-activated)."""
+    ensure_author_stats(post.author_id)
+    stats = AuthorStats.objects.filter(user_id=post.author_id)
+    stats.update(
+        post_count=F("post_count") + 1,
+        like_count=F("like_count") + _stored(post, "like_count"),
+        comment_count=F("comment_count") + _stored(post, "comment_count"),
+    )
+    stats.filter(Q(latest_post_at__isnull=True) | Q(latest_post_at__lt=post.created_at)).update(
+        latest_post=post, latest_post_at=post.created_at,
+    )
+
+
+def post_removed(post, deleted=False):
+    """A post stopped being visible (deactivated, or about to be deleted while active)."""
+    changes = {"post_count": _minus("post_count", 1), "like_count": _minus("like_count", _stored(post, "like_count"))}
+    if not deleted:
+        changes["comment_count"] = _minus("comment_count", _stored(post, "comment_count"))
+    stats = AuthorStats.objects.filter(user_id=post.author_id)
+    stats.update(**changes)
+    if stats.filter(Q(latest_post_id=post.pk) | Q(latest_post_id__isnull=True)).exists():
+        refresh_latest_post(post.author_id, exclude=post.pk)
+
+
+def refresh_latest_post(author_id, exclude=None):
+    latest = (
+        BlogPost.objects.filter(author_id=author_id, is_active=True).exclude(pk=exclude)
+        .order_by("-created_at", "-id").values("pk", "created_at").first()
+    )
+    AuthorStats.objects.filter(user_id=author_id).update(
+        latest_post_id=latest and latest["pk"], latest_post_at=latest and latest["created_at"],
+    )
+
+
+def like_changed(post, delta):
+    if post.is_active:
+        field = "like_count"
+        AuthorStats.objects.filter(user_id=post.author_id).update(
+            like_count=F(field) + delta if delta > 0 else _minus(field, -delta)
+        )
+
+
+def comment_changed(post_id, delta):
+    """The post is not loaded here, its author and visibility are read inside the UPDATE."""
+    author = BlogPost.objects.filter(pk=post_id, is_active=True).values("author_id")
+    field = "comment_count"
+    AuthorStats.objects.filter(user_id=Subquery(author)).update(
+        comment_count=F(field) + delta if delta > 0 else _minus(field, -delta)
+    )
+
+
+def rebuild_author_stats(user_model, post_model, like_model, comment_model, stats_model, batch_size=500):
+    """
+    Recount every author from the real rows, in pk-ranged batches of users.
+    Takes the model classes so the migration can run it on historical models. Returns the number of authors.
+    """
+    # one correlated subquery per value and no join on the outer query, so each runs once per author
+    def count(queryset, author_field):
+        rows = (
+            queryset.filter(**{author_field: OuterRef("pk")}).order_by()
+            .values(author_field).annotate(total=Count("pk")).values("total")
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    latest = post_model.objects.filter(author=OuterRef("pk"), is_active=True).order_by("-created_at", "-id")
+    total, last_pk = 0, 0
+    while True:
+        authors = list(
+            user_model.objects.filter(pk__gt=last_pk)
+            .filter(Exists(post_model.objects.filter(author=OuterRef("pk")))).order_by("pk")
+            .annotate(
+                n_posts=count(post_model.objects.filter(is_active=True), "author"),
+                n_likes=count(like_model.objects.filter(post__is_active=True), "post__author"),
+                n_comments=count(comment_model.objects.filter(post__is_active=True), "post__author"),
+                latest_id=Subquery(latest.values("pk")[:1]), latest_at=Subquery(latest.values("created_at")[:1]),
+            )
+            .values("pk", "n_posts", "n_likes", "n_comments", "latest_id", "latest_at")[:batch_size]
+        )
+        if not authors:
+            return total
+        last_pk = authors[-1]["pk"]
+        rows = [
+            stats_model(
+                user_id=a["pk"], post_count=a["n_posts"], like_count=a["n_likes"], comment_count=a["n_comments"],
+                latest_post_id=a["latest_id"], latest_post_at=a["latest_at"],
+            )
+            for a in authors
+        ]
+        stats_model.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["user"],
+            update_fields=["post_count", "like_count", "comment_count", "latest_post", "latest_post_at", "updated_at"],
+        )
+        total += len(rows)
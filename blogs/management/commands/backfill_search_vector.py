@@ -0,0 +1,36 @@
+# blogs/management/commands/backfill_search_vector.py
+# run from project root: python manage.py backfill_search_vector [--batch-size 500] [--all]
+# fills BlogPost.search_vector for rows saved before full-text search existed (postgres only)
+from django.core.management.base import BaseCommand
+from blogs.models import BlogPost
+from blogs.search import post_search_vector, uses_postgres_search
+
+
+class Command(BaseCommand):
+    help = 'Backfill BlogPost.search_vector in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Rebuild every row, not only the empty ones')
+
+    def handle(self, *args, **options):
+        if not uses_postgres_search():
+            self.stdout.write(self.style.WARNING('Not a postgres database, search uses the icontains fallback. Nothing to do.'))
+            return
+
+        batch_size = options['batch_size']
+        queryset = BlogPost.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        # walk by primary key so every batch is an index range, not an OFFSET
+        last_pk, total = 0, 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            total += BlogPost.objects.filter(pk__in=pks).update(search_vector=post_search_vector())
+            last_pk = pks[-1]
+            self.stdout.write(f"  {total} post(s) indexed")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled search_vector on {total} post(s)"))
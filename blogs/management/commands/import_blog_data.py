@@ -0,0 +1,303 @@
+# blogs/management/commands/import_blog_data.py
+# run from project root: python manage.py import_blog_data export.ndjson [--batch-size 1000] [--create-categories] [--dry-run]
+# bulk import of posts, comments and likes, one JSON object per line ("-" reads stdin):
+#   {"type": "post", "ref": "old-17", "title": "...", "body": "...", "author": "anup", "category": "Programming",
+#    "is_premium": false, "is_active": true, "video_url": "", "image": "<cloudinary public_id>", "created_at": "2024-05-01T10:00:00Z"}
+#   {"type": "comment", "post_ref": "old-17", "author": "nax", "body": "...", "created_at": "..."}
+#   {"type": "like", "post_ref": "old-17", "user": "few", "created_at": "..."}
+# comments and likes point at posts of the same run through "ref", so a post must come before its comments / likes.
+# - rows are validated with the API serializers (one instance per type, reused), invalid rows are skipped and reported
+# - authors and categories are resolved through in-memory dicts, one query per batch for names not seen yet
+# - each batch is one bulk_create in its own transaction
+# - created_at is kept from the source, rows without one get the import time plus one microsecond per row
+# - save signals do not fire (no Cloudinary lookups, search vector, trending or author rollup per row),
+#   counters and derived tables are rebuilt once at the end
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+import time
+from collections import Counter
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+from blogs.author_stats import rebuild_author_stats
+from blogs.models import AuthorStats, BlogPost, Comment, Like, PostScore, make_excerpt, reading_time_minutes
+from blogs.search import uses_postgres_search
+from blogs.serializers import BlogPostSerializer, CommentSerializer
+from blogs.trending import rebuild_scores
+from categories.models import Category
+from core.response_cache import NAMESPACE_CATEGORIES, NAMESPACE_POSTS, invalidate
+
+User = get_user_model()
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportPostSerializer(BlogPostSerializer):
+    """API validation of a post, category comes in as an id resolved by the importer (no query per row)."""
+    category = serializers.IntegerField()
+    created_at = serializers.DateTimeField(required=False)
+
+    class Meta(BlogPostSerializer.Meta):
+        fields = ["title", "body", "video_url", "category", "is_active", "is_premium", "created_at"]
+        read_only_fields = []
+
+
+class ImportCommentSerializer(CommentSerializer):
+    created_at = serializers.DateTimeField(required=False)
+
+    class Meta(CommentSerializer.Meta):
+        fields = ["body", "created_at"]
+        read_only_fields = []
+
+
+class ImportLikeSerializer(serializers.Serializer):
+    created_at = serializers.DateTimeField(required=False)
+
+
+class RowError(Exception):
+    pass
+
+
+@contextmanager
+def source_timestamps(model):
+    """
+    Let bulk_create keep the created_at / updated_at set on the objects.
+    auto_now(_add) would stamp every row with the import time, and putting the source values back
+    afterwards costs a bulk_update per batch.
+    """
+    fields = [f for f in model._meta.concrete_fields if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Bulk import posts, comments and likes from an NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, - for stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-categories', action='store_true', help='Create categories that do not exist yet')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and insert, then roll everything back')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Do not rebuild search vectors, trending scores and author stats at the end')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.create_categories = options['create_categories']
+        self.verbosity = options['verbosity']
+        self.users, self.categories, self.post_refs = {}, {}, {}
+        self.seen_refs = set()
+        self.stamp = timezone.now() # last created_at handed to a row without one
+        self.pending = {"post": [], "comment": [], "like": []}
+        self.like_keys = set()
+        self.touched_posts = set()
+        self.counts, self.errors, self.error_count = Counter(), [], 0
+        self.serializers = {
+            "post": ImportPostSerializer(), "comment": ImportCommentSerializer(), "like": ImportLikeSerializer(),
+        }
+
+        started = time.perf_counter()
+        try:
+            stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        try:
+            # batches commit one by one, a dry run keeps them all in one outer transaction and rolls it back
+            with transaction.atomic() if options['dry_run'] else nullcontext():
+                self.read(stream)
+                self.finish_counters()
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        import_seconds = time.perf_counter() - started
+
+        if not options['dry_run'] and not options['skip_rebuild'] and self.counts['post']:
+            self.rebuild()
+        self.report(import_seconds, time.perf_counter() - started, options['dry_run'])
+
+    # reading
+
+    def read(self, stream):
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                kind = row.pop("type", None) if isinstance(row, dict) else None
+                if kind not in self.pending:
+                    raise RowError('"type" must be post, comment or like')
+            except (ValueError, RowError) as e:
+                self.error(line_no, e)
+                continue
+
+            self.pending[kind].append((line_no, row))
+            if len(self.pending[kind]) >= self.batch_size:
+                self.flush(kind)
+
+        for kind in ("post", "comment", "like"):
+            self.flush(kind)
+
+    def error(self, line_no, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            if isinstance(error, serializers.ValidationError):
+                error = "; ".join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error.detail.items())
+            self.errors.append((line_no, error))
+
+    # lookups, one query per batch for names not seen before
+
+    def resolve_users(self, names):
+        missing = {n for n in names if n and n not in self.users}
+        if missing:
+            self.users.update(User.objects.filter(username__in=missing).values_list("username", "pk"))
+
+    def resolve_categories(self, names):
+        missing = {n for n in names if n and n not in self.categories}
+        if missing and self.create_categories:
+            Category.objects.bulk_create([Category(name=n) for n in missing], ignore_conflicts=True)
+        if missing:
+            self.categories.update(Category.objects.filter(name__in=missing).values_list("name", "pk"))
+
+    def lookup(self, table, key, what):
+        if key not in table:
+            raise RowError(f"unknown {what} {key!r}")
+        return table[key]
+
+    # batches
+
+    def flush(self, kind):
+        rows, self.pending[kind] = self.pending[kind], []
+        if not rows:
+            return
+        if kind != "post":
+            self.flush("post")  # the posts they point at have to exist first
+        started = time.perf_counter()
+        build = {"post": self.build_post, "comment": self.build_comment, "like": self.build_like}[kind]
+        if kind == "post":
+            self.resolve_users(r.get("author") for _, r in rows)
+            self.resolve_categories(r.get("category") for _, r in rows)
+        else:
+            self.resolve_users(r.get("author" if kind == "comment" else "user") for _, r in rows)
+
+        built = []
+        for line_no, row in rows:
+            try:
+                built.append((row, build(row)))
+            except (RowError, serializers.ValidationError) as e:
+                self.error(line_no, e)
+
+        if built:
+            self.insert(kind, built)
+        if self.verbosity >= 2:
+            seconds = time.perf_counter() - started
+            self.stdout.write(f"  {kind}: {len(built)}/{len(rows)} rows in {seconds:.3f}s ({len(rows) / seconds:.0f} rows/s)")
+
+    def build_post(self, row):
+        category = self.lookup(self.categories, row.get("category"), "category")
+        data = self.serializers["post"].run_validation({**row, "category": category})
+        author_id = self.lookup(self.users, row.get("author"), "author")
+        ref = row.get("ref")
+        if ref is not None:
+            # post_refs only gets the pks once the batch is inserted, a ref repeated within one batch is caught here
+            if str(ref) in self.seen_refs:
+                raise RowError(f"duplicate post ref {ref!r}")
+            self.seen_refs.add(str(ref))
+        body = data["body"]
+        return BlogPost(
+            title=data["title"], body=body, video_url=data.get("video_url", ""),
+            is_active=data.get("is_active", True), is_premium=data.get("is_premium", False),
+            author_id=author_id, category_id=data["category"],
+            image=row.get("image") or None,  # public_id of an image already on Cloudinary, nothing is uploaded
+            excerpt=make_excerpt(body), reading_time_minutes=reading_time_minutes(body),
+            created_at=data.get("created_at"),
+        )
+
+    def build_comment(self, row):
+        data = self.serializers["comment"].run_validation(row)
+        post_id = self.lookup(self.post_refs, str(row.get("post_ref")), "post_ref")
+        return Comment(
+            post_id=post_id, author_id=self.lookup(self.users, row.get("author"), "author"),
+            body=data["body"], created_at=data.get("created_at"),
+        )
+
+    def build_like(self, row):
+        data = self.serializers["like"].run_validation(row)
+        post_id = self.lookup(self.post_refs, str(row.get("post_ref")), "post_ref")
+        user_id = self.lookup(self.users, row.get("user"), "user")
+        if (post_id, user_id) in self.like_keys:
+            raise RowError("duplicate like")
+        self.like_keys.add((post_id, user_id))
+        return Like(post_id=post_id, user_id=user_id, created_at=data.get("created_at"))
+
+    def insert(self, kind, built):
+        objs = [obj for _, obj in built]
+        self.stamp = max(self.stamp, timezone.now())
+        for obj in objs:
+            if obj.created_at is None: # distinct, increasing in file order, never a batch-sized tie on created_at
+                self.stamp += timedelta(microseconds=1)
+                obj.created_at = self.stamp
+            if kind != "like":
+                obj.updated_at = obj.created_at
+        model = type(objs[0])
+        with transaction.atomic(), source_timestamps(model):
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+        self.counts[kind] += len(objs)
+        if kind == "post":
+            for row, obj in built:
+                if row.get("ref") is not None:
+                    self.post_refs[str(row["ref"])] = obj.pk
+        else:
+            self.touched_posts.update(obj.post_id for obj in objs)
+
+    def finish_counters(self):
+        """like_count / comment_count of the posts that got likes or comments, one UPDATE per batch."""
+        def count(model):
+            rows = model.objects.filter(post=OuterRef("pk")).order_by().values("post").annotate(total=Count("pk")).values("total")
+            return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+        post_ids = sorted(self.touched_posts)
+        for start in range(0, len(post_ids), self.batch_size):
+            BlogPost.objects.filter(pk__in=post_ids[start:start + self.batch_size]).update(
+                like_count=count(Like), comment_count=count(Comment),
+            )
+
+    def rebuild(self):
+        started = time.perf_counter()
+        if uses_postgres_search():
+            call_command('backfill_search_vector', stdout=self.stdout)
+        rebuild_scores(BlogPost, Like, Comment, PostScore)
+        rebuild_author_stats(User, BlogPost, Like, Comment, AuthorStats)
+        invalidate(NAMESPACE_POSTS, NAMESPACE_CATEGORIES)
+        self.stdout.write(f"rebuilt search vectors, trending scores and author stats in {time.perf_counter() - started:.2f}s")
+
+    def report(self, import_seconds, total_seconds, dry_run):
+        rows = sum(self.counts.values())
+        for line_no, message in sorted(self.errors):
+            self.stderr.write(f"line {line_no}: {message}")
+        if self.error_count > len(self.errors):
+            self.stderr.write(f"... {self.error_count - len(self.errors)} more error(s)")
+        summary = (
+            f"{'validated' if dry_run else 'imported'} {self.counts['post']} post(s), {self.counts['comment']} comment(s), "
+            f"{self.counts['like']} like(s), skipped {self.error_count} invalid row(s) in {import_seconds:.2f}s "
+            f"({rows / import_seconds if import_seconds else 0:.0f} rows/s), total {total_seconds:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(summary) if not self.error_count else self.style.WARNING(summary))
+        if dry_run:
+            self.stdout.write("dry run, nothing was saved")
+
@@ -0,0 +1,46 @@
+# blogs/management/commands/rebuild_post_counters.py
+# run from project root: python manage.py rebuild_post_counters
+# repairs BlogPost.like_count / comment_count if they have drifted from the real row counts
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from blogs.models import BlogPost, Comment, Like
+
+
+def _count_subquery(model):
+    """Correlated COUNT(*) of `model` rows pointing at the outer BlogPost."""
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recalculate like_count and comment_count on BlogPosts where they drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted posts, do not write')
+
+    def handle(self, *args, **options):
+        real_likes = _count_subquery(Like)
+        real_comments = _count_subquery(Comment)
+
+        drifted = (
+            BlogPost.objects.annotate(real_likes=real_likes, real_comments=real_comments)
+            .filter(~Q(like_count=real_likes) | ~Q(comment_count=real_comments))
+        )
+        drifted_count = drifted.count()
+        self.stdout.write(f"{drifted_count} post(s) with drifted counters")
+
+        if options['dry_run'] or not drifted_count:
+            return
+
+        # one UPDATE ... SET col = (SELECT COUNT(*) ...) WHERE <drifted>, rows already right are not rewritten
+        with transaction.atomic():
+            updated = drifted.update(like_count=real_likes, comment_count=real_comments)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters on {updated} post(s)"))
@@ -0,0 +1,20 @@
+# blogs/management/commands/recompute_post_scores.py
+# run from project root: python manage.py recompute_post_scores   (periodically, e.g. nightly cron)
+# rebuilds every PostScore from the likes and comments that still exist, folding in unlikes and deleted
+# comments, which the incremental updates do not subtract.
+import time
+from django.core.management.base import BaseCommand
+from blogs.models import BlogPost, Comment, Like, PostScore
+from blogs.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores of all posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild_scores(BlogPost, Like, Comment, PostScore, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {total} post score(s) in {time.perf_counter() - started:.2f}s"))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Existing posts start from their real like/comment counts, one UPDATE with a COUNT subquery per counter."""
+    BlogPost = apps.get_model('blogs', 'BlogPost')
+
+    def counted(model):
+        rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    BlogPost.objects.update(like_count=counted(apps.get_model('blogs', 'Like')), comment_count=counted(apps.get_model('blogs', 'Comment')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0004_blogpost_is_premium'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:09
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# frozen copies of blogs.models' helpers as of this migration, later changes to those must not rewrite history
+EXCERPT_LENGTH = 280 # characters
+WORDS_PER_MINUTE = 200
+
+
+def make_excerpt(body):
+    return Truncator(" ".join(body.split())).chars(EXCERPT_LENGTH)
+
+
+def reading_time_minutes(body):
+    return max(1, -(-len(body.split()) // WORDS_PER_MINUTE)) # ceil, at least one minute
+
+
+def fill_excerpt_and_reading_time(apps, schema_editor):
+    BlogPost = apps.get_model('blogs', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('id', 'body').iterator(chunk_size=500):
+        post.excerpt = make_excerpt(post.body)
+        post.reading_time_minutes = reading_time_minutes(post.body)
+        batch.append(post)
+        if len(batch) >= 500:
+            BlogPost.objects.bulk_update(batch, ['excerpt', 'reading_time_minutes'])
+            batch = []
+    BlogPost.objects.bulk_update(batch, ['excerpt', 'reading_time_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0007_blogpost_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=280),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time_minutes',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(fill_excerpt_and_reading_time, migrations.RunPython.noop),
+    ]
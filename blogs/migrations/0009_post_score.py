@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:21
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# frozen copy of blogs.trending's scoring as of this migration, later changes to it must not rewrite history
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+POST_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+BATCH_SIZE = 500
+
+
+def event_score(weight, at):
+    half_life = getattr(settings, "TRENDING_HALF_LIFE_HOURS", 24) * 3600
+    return math.log2(weight) + (at - EPOCH).total_seconds() / half_life
+
+
+def log_add(*scores):
+    top = max(scores)
+    return top + math.log2(sum(2 ** (s - top) for s in scores))
+
+
+def fill_post_scores(apps, schema_editor):
+    BlogPost = apps.get_model('blogs', 'BlogPost')
+    PostScore = apps.get_model('blogs', 'PostScore')
+    events = ((apps.get_model('blogs', 'Like'), LIKE_WEIGHT), (apps.get_model('blogs', 'Comment'), COMMENT_WEIGHT))
+    last_pk = 0
+    while True:
+        posts = list(
+            BlogPost.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values('pk', 'created_at', 'is_active', 'is_premium')[:BATCH_SIZE]
+        )
+        if not posts:
+            return
+        last_pk = posts[-1]['pk']
+        terms = {p['pk']: [event_score(POST_WEIGHT, p['created_at'])] for p in posts}
+        for model, weight in events:
+            for post_id, created_at in model.objects.filter(post_id__in=terms).values_list('post_id', 'created_at').iterator():
+                terms[post_id].append(event_score(weight, created_at))
+        PostScore.objects.bulk_create([
+            PostScore(post_id=p['pk'], score=log_add(*terms[p['pk']]), is_active=p['is_active'], is_premium=p['is_premium'])
+            for p in posts
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0008_blogpost_excerpt_reading_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_score', serialize=False, to='blogs.blogpost')),
+                ('score', models.FloatField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_premium', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_active', 'is_premium', '-score'], name='postscore_visible_score_idx'), models.Index(fields=['is_active', '-score'], name='postscore_active_score_idx')],
+            },
+        ),
+        migrations.RunPython(fill_post_scores, migrations.RunPython.noop),
+    ]
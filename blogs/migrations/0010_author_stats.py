@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# frozen copy of blogs.author_stats.rebuild_author_stats as of this migration, later changes to it must not rewrite history
+BATCH_SIZE = 500
+
+
+def fill_author_stats(apps, schema_editor):
+    User = apps.get_model('users', 'CustomUser')
+    BlogPost = apps.get_model('blogs', 'BlogPost')
+    Like = apps.get_model('blogs', 'Like')
+    Comment = apps.get_model('blogs', 'Comment')
+    AuthorStats = apps.get_model('blogs', 'AuthorStats')
+
+    def count(queryset, author_field):
+        rows = (
+            queryset.filter(**{author_field: OuterRef('pk')}).order_by()
+            .values(author_field).annotate(total=Count('pk')).values('total')
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    latest = BlogPost.objects.filter(author=OuterRef('pk'), is_active=True).order_by('-created_at', '-id')
+    last_pk = 0
+    while True:
+        authors = list(
+            User.objects.filter(pk__gt=last_pk)
+            .filter(Exists(BlogPost.objects.filter(author=OuterRef('pk')))).order_by('pk')
+            .annotate(
+                n_posts=count(BlogPost.objects.filter(is_active=True), 'author'),
+                n_likes=count(Like.objects.filter(post__is_active=True), 'post__author'),
+                n_comments=count(Comment.objects.filter(post__is_active=True), 'post__author'),
+                latest_id=Subquery(latest.values('pk')[:1]), latest_at=Subquery(latest.values('created_at')[:1]),
+            )
+            .values('pk', 'n_posts', 'n_likes', 'n_comments', 'latest_id', 'latest_at')[:BATCH_SIZE]
+        )
+        if not authors:
+            return
+        last_pk = authors[-1]['pk']
+        AuthorStats.objects.bulk_create([
+            AuthorStats(
+                user_id=a['pk'], post_count=a['n_posts'], like_count=a['n_likes'], comment_count=a['n_comments'],
+                latest_post_id=a['latest_id'], latest_post_at=a['latest_at'],
+            )
+            for a in authors
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0009_post_score'),
+        ('users', '0004_auth_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('like_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('latest_post_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blogs.blogpost')),
+            ],
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0010_author_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['is_premium', '-created_at', '-id'], name='blogpost_active_premium_idx'),
+        ),
+    ]
@@ -2,9 +2,28 @@ from django.db import models
 from django.conf import settings
 from categories.models import Category
 from cloudinary.models import CloudinaryField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.utils.text import Truncator
+from core.tracking import TrackedFieldsMixin
 
+EXCERPT_LENGTH = 280 # characters
+WORDS_PER_MINUTE = 200
+COUNTER_FIELDS = ("like_count", "comment_count") # denormalized, never written by save() once the post exists
+
+
+def make_excerpt(body):
+    """Whitespace-collapsed start of the body, cut on a word boundary."""
+    return Truncator(" ".join(body.split())).chars(EXCERPT_LENGTH)
+
+
+def reading_time_minutes(body):
+    return max(1, -(-len(body.split()) // WORDS_PER_MINUTE)) # ceil, at least one minute
+
+
+class BlogPost(TrackedFieldsMixin, models.Model):
+    tracked_fields = ("image", "is_active", "title", "body") # lets the save signals spot a replaced image / visibility / text change without re-reading the row
 
-class BlogPost(models.Model):
     title = models.CharField(max_length=255)
     body = models.TextField()
     image = CloudinaryField("image", folder="blog-ink_post_image", blank=True, null=True) # --- image
@@ -13,13 +32,41 @@ class BlogPost(models.Model):
     is_active = models.BooleanField(default=True) #
     is_premium = models.BooleanField(default=False) # 
     category = models.ForeignKey(Category,related_name="posts",on_delete=models.CASCADE)
+    like_count = models.PositiveIntegerField(default=0) # denormalized, kept in sync by LikeViewSet.create
+    comment_count = models.PositiveIntegerField(default=0) # denormalized, kept in sync by Comment signals
+    search_vector = SearchVectorField(null=True, editable=False) # postgres full-text, filled on save (see blogs.search)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False) # precomputed on save, lists skip body
+    reading_time_minutes = models.PositiveSmallIntegerField(default=1, editable=False) # precomputed on save
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="blogpost_created_id_idx"), # cursor pagination
+            models.Index( # free-blogs / premium-blogs cursor pages, inactive posts never enter the index
+                fields=["is_premium", "-created_at", "-id"], name="blogpost_active_premium_idx", condition=models.Q(is_active=True),
+            ),
+            GinIndex(fields=["search_vector"], name="blogpost_search_vector_gin"), # full-text search, postgres only
+        ]
 
     def __str__(self):
         return self.title   
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and not self._state.adding and not kwargs.get("force_insert"):
+            # the counters move only through F() updates, a full save of a loaded post would write back stale copies
+            deferred = self.get_deferred_fields()
+            update_fields = kwargs["update_fields"] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in COUNTER_FIELDS
+            ]
+        if update_fields is None or "body" in update_fields:
+            self.excerpt = make_excerpt(self.body)
+            self.reading_time_minutes = reading_time_minutes(self.body)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "excerpt", "reading_time_minutes"}
+        super().save(*args, **kwargs)
     
 
 
@@ -32,6 +79,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_id_idx"), # cursor pagination
+        ]
 
     def __str__(self):
         return f"{self.author.username} on {self.post.title}"
@@ -43,6 +93,50 @@ class Like(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         unique_together = ('post', 'user')  # one like per user per post
+        indexes = [
+            models.Index(fields=["post", "-created_at", "-id"], name="like_post_created_id_idx"), # cursor pagination
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} liked {self.post.title}"
+
+
+class PostScore(models.Model):
+    """
+    Trending score of a post, see blogs.trending. kept up to date incrementally on likes and comments,
+    recomputed by `manage.py recompute_post_scores`. is_active / is_premium are copies of the post's flags,
+    so the top N comes straight from one index.
+    """
+    post = models.OneToOneField(BlogPost, primary_key=True, related_name="post_score", on_delete=models.CASCADE)
+    score = models.FloatField(default=0) # log2 of the time-decayed engagement, comparable across posts at any time
+    is_active = models.BooleanField(default=True)
+    is_premium = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "is_premium", "-score"], name="postscore_visible_score_idx"), # free posts only
+            models.Index(fields=["is_active", "-score"], name="postscore_active_score_idx"), # subscribers and staff
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}: {self.score:.3f}"
+
+
+
+class AuthorStats(models.Model):
+    """
+    Rollup over an author's active posts, served by /api/v1/users/{id}/stats/.
+    Updated incrementally by the post, like and comment write paths (blogs.author_stats),
+    rebuilt by `manage.py rebuild_author_stats`.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name="author_stats", on_delete=models.CASCADE)
+    post_count = models.PositiveIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0) # likes received
+    comment_count = models.PositiveIntegerField(default=0) # comments received
+    latest_post = models.ForeignKey(BlogPost, null=True, blank=True, related_name="+", on_delete=models.SET_NULL)
+    latest_post_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username} liked {self.post.title}"
\ No newline at end of file
+        return f"stats of {self.user_id}"
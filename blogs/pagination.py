@@ -0,0 +1,82 @@
+# blogs, pagination.py:
+from base64 import b64decode, b64encode
+from urllib import parse
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+    - the cursor holds the (created_at, id) of the row a page continues from, the next page is
+      WHERE created_at < c OR (created_at = c AND id < i) ORDER BY created_at DESC, id DESC LIMIT page_size + 1
+    - no COUNT(*) and no OFFSET, a deep page costs the same as page one however many rows share a created_at
+    - `previous` walks the same key the other way (ascending, then reversed in memory)
+    - the cursor is opaque, clients just follow the `next` / `previous` links
+    - backed by the (created_at, id) composite indexes on BlogPost, Comment and Like
+    """
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request)
+        self.reverse = position is not None and position[2]
+        if position is None:
+            queryset = queryset.order_by("-created_at", "-pk")
+        elif self.reverse:
+            created_at, pk, _ = position
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)).order_by("created_at", "pk")
+        else:
+            created_at, pk, _ = position
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)).order_by("-created_at", "-pk")
+
+        rows = list(queryset[:self.page_size + 1]) # one extra row tells whether there is more in this direction
+        more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, more # the page it came back from is still after it
+        else:
+            self.has_next, self.has_previous = more, position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((self.page[-1].created_at, self.page[-1].pk, False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor((self.page[0].created_at, self.page[0].pk, True))
+
+    def encode_cursor(self, position):
+        created_at, pk, reverse = position
+        tokens = {"c": created_at.isoformat(), "i": pk}
+        if reverse:
+            tokens["r"] = "1"
+        encoded = b64encode(parse.urlencode(tokens).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """(created_at, id, reverse) from the ?cursor= parameter, None on the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode("ascii")).decode("ascii"), keep_blank_values=True)
+            created_at = parse_datetime(tokens["c"][0])
+            pk = int(tokens["i"][0])
+            reverse = tokens.get("r", ["0"])[0] == "1"
+        except (TypeError, ValueError, KeyError): # binascii.Error and UnicodeError are ValueErrors
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
@@ -0,0 +1,70 @@
+# blogs, search.py:
+# full-text search for posts.
+# postgres: weighted tsvector stored in BlogPost.search_vector (GIN indexed), ranked with ts_rank, ts_headline snippets.
+# other dbs (sqlite dev db): icontains fallback (each term in title or body), posts with every term in the title
+# ranked first, snippet built in python.
+import re
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+SEARCH_CONFIG = "english"
+HEADLINE_START, HEADLINE_STOP = "<mark>", "</mark>"
+FALLBACK_SNIPPET_CHARS = 200
+
+
+def uses_postgres_search():
+    return connection.vendor == "postgresql"
+
+
+def post_search_vector():
+    """Expression used to fill BlogPost.search_vector, title weighted above body."""
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("body", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def search_posts(queryset, q):
+    """
+    Filter `queryset` to posts matching `q`, best match first.
+    Every row gets a `rank` annotation, on postgres also a `headline` one.
+    """
+    if uses_postgres_search():
+        query = SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(
+                rank=SearchRank(F("search_vector"), query),
+                headline=SearchHeadline(
+                    "body", query, config=SEARCH_CONFIG,
+                    start_sel=HEADLINE_START, stop_sel=HEADLINE_STOP, max_words=35, min_words=15,
+                ),
+            )
+            .order_by("-rank", "-created_at", "-id")
+        )
+
+    terms = q.split()
+    if not terms:
+        return queryset.none()
+    match, title_match = Q(), Q()
+    for term in terms: # every term somewhere in the post, like the tsvector over title + body
+        match &= Q(title__icontains=term) | Q(body__icontains=term)
+        title_match &= Q(title__icontains=term)
+    return (
+        queryset.filter(match)
+        .annotate(rank=Case(When(title_match, then=Value(1.0)), default=Value(0.5), output_field=FloatField()))
+        .order_by("-rank", "-created_at", "-id")
+    )
+
+
+def make_headline(text, q):
+    """Python stand-in for ts_headline: snippet around the first hit, terms wrapped in <mark>."""
+    terms = [re.escape(t) for t in q.split() if t]
+    if not terms:
+        return text[:FALLBACK_SNIPPET_CHARS]
+    pattern = re.compile("|".join(terms), re.IGNORECASE)
+    hit = pattern.search(text)
+    start = max((hit.start() if hit else 0) - FALLBACK_SNIPPET_CHARS // 4, 0)
+    snippet = text[start:start + FALLBACK_SNIPPET_CHARS]
+    return pattern.sub(lambda m: f"{HEADLINE_START}{m.group(0)}{HEADLINE_STOP}", snippet)
@@ -1,28 +1,53 @@
 from rest_framework import serializers
-from .models import BlogPost, Comment, Like
+from .models import AuthorStats, BlogPost, Comment, Like
 from cloudinary.models import CloudinaryField
+from .search import make_headline
+from core.sparse_fields import SparseFieldsSerializerMixin
 
 MAX_IMAGE_KB = 2 * 1024  # 2 MB
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source="author.username", read_only=True)
     category_name   = serializers.CharField(source="category.name", read_only=True)
+    is_liked_by_me  = serializers.SerializerMethodField()
 
     class Meta:
         model  = BlogPost
         fields = [
             "id", "title", "body", "image", "video_url",
             "author", "author_username", "category", "category_name",
-            "created_at", "updated_at", "is_active", "is_premium"
+            "created_at", "updated_at", "is_active", "is_premium",
+            "like_count", "comment_count", "is_liked_by_me",
+            "excerpt", "reading_time_minutes",
         ]
-        read_only_fields = ["id", "author", "created_at", "updated_at"]
+        read_only_fields = ["id", "author", "created_at", "updated_at", "like_count", "comment_count", "excerpt", "reading_time_minutes"]
+
+    def get_is_liked_by_me(self, obj):
+        # EXISTS annotation from BlogPostViewSet, no per-row query. False for anonymous users
+        return getattr(obj, "is_liked_by_me", False)
 
     def validate_image(self, value):
         if value and value.size > MAX_IMAGE_KB * 1024:
             raise serializers.ValidationError(f"Image must be ≤ {MAX_IMAGE_KB} KB.")
         return value
-    
-    
+
+
+
+class BlogPostSearchSerializer(BlogPostSerializer):
+    """BlogPostSerializer plus search rank and a highlighted snippet of the body."""
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.SerializerMethodField()
+
+    class Meta(BlogPostSerializer.Meta):
+        fields = BlogPostSerializer.Meta.fields + ["rank", "headline"]
+
+    def get_headline(self, obj):
+        headline = getattr(obj, "headline", None) # annotated by ts_headline on postgres
+        if headline is None:
+            headline = make_headline(obj.body, self.context.get("search_query", ""))
+        return headline
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
 
@@ -38,4 +63,12 @@ class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
         fields = ['id', 'post', 'user', 'username', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']	
\ No newline at end of file
+        read_only_fields = ['id', 'user', 'created_at']	
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    latest_post_title = serializers.CharField(source="latest_post.title", read_only=True, default=None)
+
+    class Meta:
+        model = AuthorStats
+        fields = ["user", "post_count", "like_count", "comment_count", "latest_post", "latest_post_title", "latest_post_at", "updated_at"]
+        read_only_fields = fields
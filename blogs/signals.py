@@ -1,31 +1,125 @@
 # delete BlogPost image when needed  (if post deleted or image updated)
-from django.db.models.signals import post_delete, pre_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from cloudinary.uploader import destroy
-from .models import BlogPost
+from .models import BlogPost, Comment
+from .search import post_search_vector, uses_postgres_search
+from .author_stats import comment_changed, post_added, post_removed
+from .trending import COMMENT_WEIGHT, create_post_score, record_engagement, sync_visibility
+from core.response_cache import NAMESPACE_CATEGORIES, NAMESPACE_POSTS, invalidate
+from core.image_cleanup import public_id_of, queue_image_deletion
+from core.tracking import NOT_LOADED
 
 
 @receiver(post_delete, sender=BlogPost)
 def delete_post_image_on_post_delete(sender, instance, **kwargs):
-    """Remove Cloudinary image when the whole post is deleted."""
+    """Queue the Cloudinary image for deletion when the whole post is deleted."""
     if instance.image:
-        destroy(instance.image.public_id)
+        queue_image_deletion(instance.image.public_id)
 
 
 @receiver(pre_save, sender=BlogPost)
-def delete_old_image_on_image_update(sender, instance, **kwargs):
-    """Remove the previous Cloudinary image when the image field is replaced."""
+def remember_replaced_image(sender, instance, update_fields=None, **kwargs):
+    """Note the previous Cloudinary image when the image field is replaced, deleted after the save (below)."""
+    instance._replaced_image_id = None
     if not instance.pk: # new post 
         return
-
-    try:
-        old_post = BlogPost.objects.get(pk=instance.pk)
-    except BlogPost.DoesNotExist:
+    if update_fields is not None and "image" not in update_fields:
         return
 
-    old_image = old_post.image
-    new_image = instance.image
+    old_image = instance.get_loaded_value("image") # snapshot taken when the post was loaded, no extra query
+    if old_image is NOT_LOADED: # built by hand or image deferred, fall back to the db
+        old_image = BlogPost.objects.filter(pk=instance.pk).values_list("image", flat=True).first()
 
+    old_id = public_id_of(old_image)
     # image changed (old exists and is different)
-    if old_image and old_image != new_image:
-        destroy(old_image.public_id)
\ No newline at end of file
+    if old_id and old_id != public_id_of(instance.image):
+        instance._replaced_image_id = old_id
+
+
+@receiver(post_save, sender=BlogPost)
+def delete_old_image_on_image_update(sender, instance, **kwargs):
+    """Queue the replaced image only after the save went through (queued on commit)."""
+    queue_image_deletion(instance.__dict__.pop("_replaced_image_id", None))
+
+
+# keep BlogPost.comment_count in sync (atomic UPDATE with F(), no read-modify-write)
+@receiver(post_save, sender=Comment)
+def increment_comment_count_on_comment_create(sender, instance, created, **kwargs):
+    """Bump the post's comment counter when a new comment is saved."""
+    if created:
+        BlogPost.objects.filter(pk=instance.post_id).update(comment_count=F("comment_count") + 1)
+        record_engagement(instance.post_id, COMMENT_WEIGHT, instance.created_at)
+        comment_changed(instance.post_id, +1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count_on_comment_delete(sender, instance, **kwargs):
+    """Lower the post's comment counter when a comment is deleted."""
+    BlogPost.objects.filter(pk=instance.post_id, comment_count__gt=0).update(comment_count=F("comment_count") - 1)
+    comment_changed(instance.post_id, -1)
+
+
+def text_changed(instance, update_fields):
+    """True if this save wrote a new title or body, from the load-time snapshot (refreshed only after the signal)."""
+    for name in ("title", "body"):
+        if update_fields is not None and name not in update_fields:
+            continue
+        if name not in instance.__dict__: # deferred and untouched, not written
+            continue
+        old = instance.get_loaded_value(name)
+        if old is NOT_LOADED or old != instance.__dict__[name]:
+            return True
+    return False
+
+
+@receiver(post_save, sender=BlogPost)
+def update_search_vector_on_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Refresh the full-text search vector when title or body changed (postgres only)."""
+    if not uses_postgres_search():
+        return
+    if not created and not text_changed(instance, update_fields):
+        return # e.g. a like/is_active/image save, the vector would come out the same
+    BlogPost.objects.filter(pk=instance.pk).update(search_vector=post_search_vector())
+
+
+@receiver(post_save, sender=BlogPost)
+def keep_post_score_in_sync(sender, instance, created, update_fields=None, **kwargs):
+    """New posts get a trending row, visibility changes are copied to it."""
+    if created:
+        create_post_score(instance)
+    elif update_fields is None or {"is_active", "is_premium"} & set(update_fields):
+        sync_visibility(instance)
+
+
+# keep the author's AuthorStats rollup in sync (likes are handled in LikeViewSet.create)
+@receiver(post_save, sender=BlogPost)
+def update_author_stats_on_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Count the post when it is created active or re-activated, uncount it when deactivated."""
+    if created:
+        if instance.is_active:
+            post_added(instance)
+        return
+    if update_fields is not None and "is_active" not in update_fields:
+        return
+    was_active = instance.get_loaded_value("is_active") # snapshot, refreshed only after this signal
+    if was_active is NOT_LOADED or was_active == instance.is_active:
+        return
+    if instance.is_active:
+        post_added(instance)
+    else:
+        post_removed(instance)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def update_author_stats_on_post_delete(sender, instance, **kwargs):
+    """Uncount an active post before it is deleted, while its stored counters can still be read."""
+    if instance.is_active:
+        post_removed(instance, deleted=True)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_cached_post_lists(sender, instance, **kwargs):
+    """Drop cached post list pages, and category lists (post counts), after any post is written or deleted."""
+    invalidate(NAMESPACE_POSTS, NAMESPACE_CATEGORIES)
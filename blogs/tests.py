@@ -1,3 +1,752 @@
-from django.test import TestCase
+import importlib
+import json
+import math
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from categories.models import Category
+from core.models import OrphanedImage
+from core.response_cache import get_stats
+from .models import AuthorStats, BlogPost, Comment, Like, PostScore
+from .pagination import CreatedAtCursorPagination
+from .trending import COMMENT_WEIGHT, LIKE_WEIGHT, event_score, log_add, record_engagement
+
+User = get_user_model()
+
+
+def cloudinary_image(public_id):
+    return CloudinaryResource(public_id=public_id, type='upload', resource_type='image')
+
+
+def make_post(author, category, **fields):
+    fields = {'title': 'Post', 'body': 'Some body text', **fields}
+    return BlogPost.objects.create(author=author, category=category, **fields)
+
+
+class BlogTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer', email='writer@example.com', password='pass12345')
+        cls.category = Category.objects.create(name='Tech')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def queued_images(self):
+        return sorted(OrphanedImage.objects.values_list('public_id', flat=True))
+
+
+class PostImageCleanupTests(BlogTestCase):
+
+    def test_replaced_image_is_queued_after_commit(self):
+        post = make_post(self.author, self.category, image=cloudinary_image('blog/old'))
+        post = BlogPost.objects.get(pk=post.pk)
+        post.image = cloudinary_image('blog/new')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.queued_images(), ['blog/old'])
+
+    def test_rolled_back_save_queues_nothing(self):
+        post = BlogPost.objects.get(pk=make_post(self.author, self.category, image=cloudinary_image('blog/old')).pk)
+        post.image = cloudinary_image('blog/new')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                post.save()
+                transaction.set_rollback(True)
+        self.assertEqual(self.queued_images(), [])
+
+    def test_unrelated_update_and_same_image_queue_nothing(self):
+        post = BlogPost.objects.get(pk=make_post(self.author, self.category, image=cloudinary_image('blog/old')).pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = 'Renamed'
+            post.save(update_fields=['title'])
+            post.save()
+        self.assertEqual(self.queued_images(), [])
+
+    def test_deleted_post_image_is_queued(self):
+        post = make_post(self.author, self.category, image=cloudinary_image('blog/old'))
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(self.queued_images(), ['blog/old'])
+
+    def test_loaded_post_is_not_read_again(self):
+        post = BlogPost.objects.get(pk=make_post(self.author, self.category, image=cloudinary_image('blog/old')).pk)
+        post.image = cloudinary_image('blog/new')
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "blogs_blogpost"' in q['sql']]
+        self.assertEqual(reads, [])
+        self.assertEqual(self.queued_images(), ['blog/old'])
+
+    def test_snapshot_follows_each_save(self):
+        post = BlogPost.objects.get(pk=make_post(self.author, self.category, image=cloudinary_image('blog/first')).pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            for public_id in ('blog/second', 'blog/third'):
+                post.image = cloudinary_image(public_id)
+                post.save()
+        self.assertEqual(self.queued_images(), ['blog/first', 'blog/second'])
+
+    def test_deferred_image_falls_back_to_one_select(self):
+        pk = make_post(self.author, self.category, image=cloudinary_image('blog/old')).pk
+        post = BlogPost.objects.defer('image').get(pk=pk)
+        post.image = cloudinary_image('blog/new')
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT "blogs_blogpost"."image"')]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(self.queued_images(), ['blog/old'])
+
+
+class CounterTests(BlogTestCase):
+
+    def test_comment_signals_move_comment_count(self):
+        post = make_post(self.author, self.category)
+        first = Comment.objects.create(post=post, author=self.author, body='one')
+        Comment.objects.create(post=post, author=self.author, body='two')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_decrement_never_goes_below_zero(self):
+        post = make_post(self.author, self.category)
+        comment = Comment.objects.create(post=post, author=self.author, body='one')
+        BlogPost.objects.filter(pk=post.pk).update(comment_count=0)  # drifted
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_like_toggle_moves_like_count(self):
+        post = make_post(self.author, self.category)
+        client = self.client_for(self.author)
+        url = f'/api/v1/posts/{post.pk}/likes/'
+
+        response = client.post(url)
+        self.assertEqual((response.status_code, response.data), (201, {'liked': True}))
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 1)
+
+        response = client.post(url)
+        self.assertEqual((response.status_code, response.data), (200, {'liked': False}))
+        post.refresh_from_db()
+        self.assertEqual((post.like_count, Like.objects.count()), (0, 0))
+
+    def test_saving_a_stale_post_keeps_the_counters(self):
+        post = make_post(self.author, self.category)
+        Comment.objects.create(post=post, author=self.author, body='one')
+        self.client_for(self.author).post(f'/api/v1/posts/{post.pk}/likes/')
+        post.title = 'Edited' # this instance still holds like_count=0, comment_count=0
+        post.save()
+        self.client_for(self.author).patch(f'/api/v1/posts/{post.pk}/', {'title': 'Edited again'})
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.like_count, post.comment_count), ('Edited again', 1, 1))
+
+    def test_unlike_of_an_already_removed_like_does_not_decrement(self):
+        post = make_post(self.author, self.category)
+        client = self.client_for(self.author)
+        client.post(f'/api/v1/posts/{post.pk}/likes/')
+        BlogPost.objects.filter(pk=post.pk).update(like_count=5)
+        stale = Like.objects.get()
+        with mock.patch.object(Like.objects, 'get_or_create', return_value=(stale, False)):
+            Like.objects.filter(pk=stale.pk).delete() # a concurrent unlike got there first
+            response = client.post(f'/api/v1/posts/{post.pk}/likes/')
+        self.assertEqual(response.data, {'liked': False})
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 5)
+        self.assertEqual(client.post('/api/v1/posts/999999/likes/').status_code, 404)
+
+    def test_rebuild_rewrites_only_drifted_posts(self):
+        drifted, fine = make_post(self.author, self.category), make_post(self.author, self.category)
+        Comment.objects.create(post=fine, author=self.author, body='one')
+        BlogPost.objects.filter(pk=drifted.pk).update(like_count=3)
+        out = StringIO()
+        call_command('rebuild_post_counters', stdout=out)
+        self.assertIn('Rebuilt counters on 1 post(s)', out.getvalue())
+        self.assertEqual(
+            list(BlogPost.objects.order_by('pk').values_list('like_count', 'comment_count')), [(0, 0), (0, 1)],
+        )
+
+    def test_migration_backfills_counters(self):
+        post = make_post(self.author, self.category)
+        Comment.objects.create(post=post, author=self.author, body='one')
+        Like.objects.create(post=post, user=self.author)
+        BlogPost.objects.update(like_count=0, comment_count=0)
+
+        migration = importlib.import_module('blogs.migrations.0005_blogpost_like_count_comment_count')
+        migration.fill_counters(apps, None)
+        post.refresh_from_db()
+        self.assertEqual((post.like_count, post.comment_count), (1, 1))
+
+
+class LikedByMeTests(BlogTestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='x')
+        self.posts = [make_post(self.author, self.category, title=f'Post {n}') for n in range(4)]
+        for post in self.posts[:2]:
+            Like.objects.create(user=self.reader, post=post)
+
+    def liked_flags(self, client, url='/api/v1/posts/'):
+        return {post['id']: post['is_liked_by_me'] for post in client.get(url).data['results']}
+
+    def test_flag_per_post(self):
+        liked = {post.pk for post in self.posts[:2]}
+        self.assertEqual(self.liked_flags(self.client_for(self.reader)), {post.pk: post.pk in liked for post in self.posts})
+        self.assertEqual(set(self.liked_flags(APIClient()).values()), {False})
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        client = self.client_for(self.reader)
+        with CaptureQueriesContext(connection) as few:
+            client.get('/api/v1/posts/')
+        for n in range(6):
+            Like.objects.create(user=self.reader, post=make_post(self.author, self.category, title=f'More {n}'))
+        with self.assertNumQueries(len(few)):
+            self.assertEqual(len(client.get('/api/v1/posts/').data['results']), 10)
+
+    def test_liked_filters(self):
+        client = self.client_for(self.reader)
+        expected = {post.pk: True for post in self.posts[:2]}
+        self.assertEqual(self.liked_flags(client, '/api/v1/posts/liked-posts/'), expected)
+        self.assertEqual(self.liked_flags(client, '/api/v1/posts/?liked_by_me=true'), expected)
+        self.assertEqual(set(self.liked_flags(client, '/api/v1/posts/?liked_by_me=false').values()), {False})
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(BlogTestCase):
+
+    def score_of(self, post):
+        return PostScore.objects.get(post=post).score
+
+    def test_log_add(self):
+        self.assertAlmostEqual(log_add(3.0, 3.0), 4.0)
+        self.assertAlmostEqual(log_add(0.0, 1.0, 2.0), math.log2(7))
+        self.assertAlmostEqual(log_add(5000.0, 5000.0), 5001.0) # 2^5000 would overflow a float
+
+    def test_event_doubles_every_half_life(self):
+        at = timezone.now()
+        self.assertAlmostEqual(event_score(1.0, at + timedelta(hours=24)) - event_score(1.0, at), 1.0)
+        self.assertAlmostEqual(event_score(COMMENT_WEIGHT, at) - event_score(LIKE_WEIGHT, at), 1.0)
+
+    def test_sql_update_matches_python(self):
+        post = make_post(self.author, self.category)
+        expected = self.score_of(post)
+        for hours in (1, 30, 2):
+            at = timezone.now() - timedelta(hours=hours)
+            record_engagement(post.pk, LIKE_WEIGHT, at)
+            expected = log_add(expected, event_score(LIKE_WEIGHT, at))
+        self.assertAlmostEqual(self.score_of(post), expected, places=6)
+
+    def test_incremental_scores_match_recompute(self):
+        post = make_post(self.author, self.category)
+        Comment.objects.create(post=post, author=self.author, body='First')
+        like = Like.objects.create(post=post, user=self.author)
+        record_engagement(post.pk, LIKE_WEIGHT, like.created_at)
+        incremental = self.score_of(post)
+        call_command('recompute_post_scores', stdout=StringIO())
+        self.assertAlmostEqual(self.score_of(post), incremental, places=6)
+
+    def test_migration_backfill_matches_recompute(self):
+        post = make_post(self.author, self.category)
+        Comment.objects.create(post=post, author=self.author, body='First')
+        Like.objects.create(post=post, user=self.author)
+        call_command('recompute_post_scores', stdout=StringIO())
+        expected = self.score_of(post)
+        PostScore.objects.all().delete()
+
+        migration = importlib.import_module('blogs.migrations.0009_post_score')
+        migration.fill_post_scores(apps, None)
+        self.assertAlmostEqual(self.score_of(post), expected, places=6)
+
+    def test_recent_engagement_outranks_older(self):
+        old_likes, fresh_like, premium, hidden = (make_post(self.author, self.category, title=t) for t in ('Old', 'Fresh', 'Premium', 'Hidden'))
+        premium.is_premium = True
+        premium.save()
+        hidden.is_active = False
+        hidden.save()
+        for _ in range(3): # 3 * 2^-2 = 0.75 now
+            record_engagement(old_likes.pk, LIKE_WEIGHT, timezone.now() - timedelta(hours=48))
+        record_engagement(fresh_like.pk, LIKE_WEIGHT)
+        for post in (premium, hidden):
+            record_engagement(post.pk, COMMENT_WEIGHT)
+
+        response = self.client_for(self.author).get('/api/v1/posts/trending/', {'limit': 2})
+        self.assertEqual([post['title'] for post in response.data], ['Fresh', 'Old'])
+
+
+class AuthorStatsTests(BlogTestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='x')
+
+    def stats(self):
+        return AuthorStats.objects.filter(user=self.author).values_list(
+            'post_count', 'like_count', 'comment_count', 'latest_post_id',
+        ).first()
+
+    def assertMatchesRebuild(self, expected):
+        self.assertEqual(self.stats(), expected)
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.stats(), expected)
+
+    def toggle_like(self, post):
+        self.client_for(self.reader).post(f'/api/v1/posts/{post.pk}/likes/')
+
+    def test_incremental_upkeep_matches_rebuild(self):
+        first = make_post(self.author, self.category, title='First')
+        second = make_post(self.author, self.category, title='Second')
+        make_post(self.author, self.category, title='Draft', is_active=False)
+        self.assertMatchesRebuild((2, 0, 0, second.pk))
+
+        self.toggle_like(first)
+        Comment.objects.create(post=first, author=self.reader, body='Nice')
+        Comment.objects.create(post=second, author=self.reader, body='Also nice')
+        self.assertMatchesRebuild((2, 1, 2, second.pk))
+
+        second.is_active = False
+        second.save()
+        self.assertMatchesRebuild((1, 1, 1, first.pk))
+        second.is_active = True
+        second.save()
+        self.assertMatchesRebuild((2, 1, 2, second.pk))
+
+        self.toggle_like(first) # unlike
+        Comment.objects.filter(post=second).delete()
+        self.assertMatchesRebuild((2, 0, 1, second.pk))
+
+        self.toggle_like(second)
+        second.delete() # its likes go with it, the latest post falls back to the next one
+        self.assertMatchesRebuild((1, 0, 1, first.pk))
+
+    def test_migration_backfill(self):
+        post = make_post(self.author, self.category)
+        make_post(self.author, self.category, is_active=False)
+        Comment.objects.create(post=post, author=self.reader, body='Nice')
+        Like.objects.create(post=post, user=self.reader)
+        AuthorStats.objects.all().delete()
+
+        migration = importlib.import_module('blogs.migrations.0010_author_stats')
+        migration.fill_author_stats(apps, None)
+        self.assertEqual(self.stats(), (1, 1, 1, post.pk))
+
+    def test_endpoint(self):
+        User.objects.filter(pk__in=[self.author.pk, self.reader.pk]).update(is_active=True)
+        post = make_post(self.author, self.category, title='Only')
+        client = self.client_for(self.reader)
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/v1/users/{self.author.pk}/stats/')
+        self.assertEqual(
+            (response.data['post_count'], response.data['latest_post'], response.data['latest_post_title']),
+            (1, post.pk, 'Only'),
+        )
+        self.assertEqual(client.get(f'/api/v1/users/{self.reader.pk}/stats/').data['post_count'], 0)
+        for pk in ('999999', 'abc'):
+            self.assertEqual(client.get(f'/api/v1/users/{pk}/stats/').status_code, 404)
+
+
+class ImportBlogDataTests(BlogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com', password='x')
+
+    def run_import(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as source:
+            source.write('\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows))
+        self.addCleanup(os.remove, source.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_blog_data', source.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def post_row(self, ref, **fields):
+        return {'type': 'post', 'ref': ref, 'title': f'Imported {ref}', 'body': 'word ' * 300, 'author': 'writer', 'category': 'Tech', **fields}
+
+    def test_imports_posts_comments_and_likes(self):
+        self.run_import([
+            self.post_row('a', created_at='2024-05-01T10:00:00Z'),
+            self.post_row('b', is_premium=True),
+            {'type': 'comment', 'post_ref': 'a', 'author': 'reader', 'body': 'Nice', 'created_at': '2024-05-02T10:00:00Z'},
+            {'type': 'like', 'post_ref': 'a', 'user': 'reader'},
+            {'type': 'like', 'post_ref': 'b', 'user': 'writer'},
+        ], '--batch-size', '1')
+
+        first = BlogPost.objects.get(title='Imported a')
+        self.assertEqual(first.created_at.isoformat(), '2024-05-01T10:00:00+00:00')
+        self.assertEqual((first.like_count, first.comment_count, first.reading_time_minutes), (1, 1, 2))
+        self.assertEqual(first.comments.get().created_at.isoformat(), '2024-05-02T10:00:00+00:00')
+        self.assertEqual(PostScore.objects.count(), 2)
+        self.assertEqual(AuthorStats.objects.values_list('post_count', 'like_count', 'comment_count').get(user=self.author), (2, 2, 1))
+        self.assertTrue(BlogPost._meta.get_field('created_at').auto_now_add) # restored after the import
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        out, err = self.run_import([
+            self.post_row('a'),
+            'not json',
+            {'type': 'share'},
+            self.post_row('b', author='nobody'),
+            self.post_row('c', category='Cooking'),
+            self.post_row('a'),
+            {'type': 'comment', 'post_ref': 'zzz', 'author': 'reader', 'body': 'Lost'},
+            {'type': 'like', 'post_ref': 'a', 'user': 'reader'},
+            {'type': 'like', 'post_ref': 'a', 'user': 'reader'},
+        ])
+        self.assertEqual(BlogPost.objects.count(), 1)
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual([line.split(':')[0] for line in err.splitlines()], [f'line {n}' for n in range(2, 10) if n != 8])
+        self.assertIn("unknown author 'nobody'", err)
+        self.assertIn('skipped 7 invalid row(s)', out)
+
+    def test_rows_without_created_at_get_distinct_increasing_times(self):
+        self.run_import([self.post_row(n) for n in range(5)], '--batch-size', '2')
+        stamps = list(BlogPost.objects.order_by('pk').values_list('created_at', flat=True))
+        self.assertEqual(stamps, sorted(set(stamps)))
+        self.assertEqual(len(stamps), 5)
+
+    def test_create_categories(self):
+        self.run_import([self.post_row('a', category='Cooking')], '--create-categories')
+        self.assertEqual(BlogPost.objects.get().category.name, 'Cooking')
+
+    def test_dry_run_saves_nothing(self):
+        out, _ = self.run_import([self.post_row('a'), {'type': 'like', 'post_ref': 'a', 'user': 'reader'}], '--dry-run')
+        self.assertIn('validated 1 post(s)', out)
+        self.assertEqual((BlogPost.objects.count(), Like.objects.count()), (0, 0))
+
+
+class CursorPaginationTests(BlogTestCase):
+
+    def test_pages_across_identical_created_at(self):
+        posts = [make_post(self.author, self.category, title=f'Post {n}') for n in range(25)]
+        BlogPost.objects.update(created_at=posts[0].created_at)
+        client = self.client_for(self.author)
+        seen, url = [], '/api/v1/posts/free-blogs/'
+        while url:
+            response = client.get(url)
+            seen += [post['id'] for post in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, sorted((post.pk for post in posts), reverse=True))
+
+    @mock.patch.object(CreatedAtCursorPagination, 'page_size', 100)
+    def test_more_ties_than_an_offset_cursor_can_skip(self):
+        BlogPost.objects.bulk_create([
+            BlogPost(author=self.author, category=self.category, title=f'Post {n}', body='Body') for n in range(1050)
+        ])
+        BlogPost.objects.update(created_at=timezone.now())
+        expected = list(BlogPost.objects.order_by('-pk').values_list('pk', flat=True))
+        client = self.client_for(self.author)
+
+        pages, url = [], '/api/v1/posts/free-blogs/'
+        while url:
+            response = client.get(url)
+            pages.append([post['id'] for post in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(sum(pages, []), expected)
+
+        previous = response.data['previous']
+        for page in reversed(pages[:-1]):
+            response = client.get(previous)
+            self.assertEqual([post['id'] for post in response.data['results']], page)
+            previous = response.data['previous']
+        self.assertIsNone(previous)
+
+    def test_tampered_cursor_is_404(self):
+        self.assertEqual(self.client_for(self.author).get('/api/v1/posts/free-blogs/?cursor=bm9wZQ==').status_code, 404)
+
+
+class SparseFieldsTests(BlogTestCase):
+
+    def setUp(self):
+        self.post = make_post(self.author, self.category, body='word ' * 450)
+        self.client = self.client_for(self.author)
+
+    def list_posts(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0], ' '.join(query['sql'] for query in queries)
+
+    def test_excerpt_and_reading_time_precomputed(self):
+        self.assertEqual(self.post.reading_time_minutes, 3)
+        self.assertTrue(self.post.excerpt.endswith('…'))
+        self.assertLessEqual(len(self.post.excerpt), 280)
+
+    def test_fields_loads_only_what_is_serialized(self):
+        row, sql = self.list_posts(fields='title,excerpt')
+        self.assertEqual(set(row), {'id', 'title', 'excerpt'})
+        self.assertNotIn('"body"', sql)
+        self.assertIn('"created_at"', sql) # cursor position
+
+    def test_omit_body(self):
+        row, sql = self.list_posts(omit='body')
+        self.assertNotIn('body', row)
+        self.assertIn('reading_time_minutes', row)
+        self.assertNotIn('"body"', sql)
+
+    def test_writes_ignore_sparse_fields(self):
+        response = self.client.patch(f'/api/v1/posts/{self.post.pk}/?fields=title', {'title': 'Renamed'})
+        self.assertIn('body', response.data)
+
+    def test_migration_backfill(self):
+        BlogPost.objects.update(excerpt='', reading_time_minutes=1)
+        migration = importlib.import_module('blogs.migrations.0008_blogpost_excerpt_reading_time')
+        migration.fill_excerpt_and_reading_time(apps, None)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt[:10], self.post.reading_time_minutes), ('word word ', 3))
+
+
+class ConditionalGetTests(BlogTestCase):
+
+    def setUp(self):
+        self.post = make_post(self.author, self.category)
+        self.client = self.client_for(self.author)  # signed in, the anonymous response cache stays out of the way
+
+    def assert_revalidates(self, url, change):
+        """200 with an ETag, 304 for the same ETag, 200 with a new ETag after `change()`."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(1):  # the validator query only, no rows fetched or serialized
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_list_revalidates_on_edit(self):
+        def edit():
+            self.post.title = 'Edited'
+            self.post.save()
+        self.assert_revalidates('/api/v1/posts/', edit)
+
+    def test_list_revalidates_on_counter_changes(self):
+        other = make_post(self.author, self.category)
+        BlogPost.objects.filter(pk=self.post.pk).update(like_count=1)
+
+        def swap_likes():  # the sum of like counts stays the same
+            BlogPost.objects.filter(pk=self.post.pk).update(like_count=0)
+            BlogPost.objects.filter(pk=other.pk).update(like_count=1)
+        self.assert_revalidates('/api/v1/posts/', swap_likes)
+
+    def test_list_revalidates_on_joined_renames(self):
+        def rename_category():
+            self.category.name = 'Science'
+            self.category.save()
+        response = self.assert_revalidates('/api/v1/posts/', rename_category)
+        self.assertEqual(response.data['results'][0]['category_name'], 'Science')
+
+        def rename_author():
+            author = User.objects.get(pk=self.author.pk)
+            author.username = 'renamed'
+            author.save()
+        response = self.assert_revalidates('/api/v1/posts/', rename_author)
+        self.assertEqual(response.data['results'][0]['author_username'], 'renamed')
+
+    def test_list_validators_come_from_the_page(self):
+        older = make_post(self.author, self.category, title='Older')
+        BlogPost.objects.filter(pk=older.pk).update(created_at=self.post.created_at - timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/', {'fields': 'title'})
+        self.assertEqual(len(queries), 1) # the page itself, no aggregate over the table
+        self.assertEqual(self.client.get('/api/v1/posts/', {'fields': 'title'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with mock.patch.object(CreatedAtCursorPagination, 'page_size', 1):
+            etag = self.client.get('/api/v1/posts/')['ETag']
+            BlogPost.objects.filter(pk=older.pk).update(like_count=5) # on page two
+            self.assertEqual(self.client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_list_revalidates_on_own_like(self):
+        self.assert_revalidates('/api/v1/posts/', lambda: self.client.post(f'/api/v1/posts/{self.post.pk}/likes/'))
+
+    def test_retrieve_revalidates_on_edit(self):
+        def edit():
+            self.post.body = 'New body'
+            self.post.save()
+        self.assert_revalidates(f'/api/v1/posts/{self.post.pk}/', edit)
+
+    def test_comment_list_revalidates_on_new_comment(self):
+        Comment.objects.create(post=self.post, author=self.author, body='one')
+        self.assert_revalidates(
+            f'/api/v1/posts/{self.post.pk}/comments/',
+            lambda: Comment.objects.create(post=self.post, author=self.author, body='two'),
+        )
+
+
+class ResponseCacheTests(BlogTestCase):
+    """File based backend in a temp dir, a backend every worker could share."""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }
+        settings_override = override_settings(CACHES=caches, RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_ALIAS='responses')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.post = make_post(self.author, self.category)
+
+    def stats(self):
+        stats = get_stats()
+        return stats['hits'], stats['misses']
+
+    def test_hit_after_miss(self):
+        first = APIClient().get('/api/v1/posts/')
+        with self.assertNumQueries(0):
+            second = APIClient().get('/api/v1/posts/')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.stats(), (1, 1))
+
+    def test_post_write_invalidates(self):
+        APIClient().get('/api/v1/posts/')
+        self.post.title = 'Edited'
+        self.post.save()
+        response = APIClient().get('/api/v1/posts/')
+        self.assertEqual(response.data['results'][0]['title'], 'Edited')
+        self.assertEqual(self.stats(), (0, 2))
+
+    def test_category_rename_invalidates_post_lists(self):
+        APIClient().get('/api/v1/posts/')
+        self.category.name = 'Science'
+        self.category.save()
+        self.assertEqual(APIClient().get('/api/v1/posts/').data['results'][0]['category_name'], 'Science')
+
+    def test_signed_in_users_bypass_anonymous_only_cache(self):
+        client = self.client_for(self.author)
+        client.get('/api/v1/posts/')
+        client.get('/api/v1/posts/')
+        self.assertEqual(self.stats(), (0, 0))
+
+    def test_per_process_backend_is_never_used(self):
+        with self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            APIClient().get('/api/v1/posts/')
+            with self.assertNumQueries(1):  # the page, not served from a cache
+                APIClient().get('/api/v1/posts/')
+            self.assertEqual(get_stats(), {'enabled': False})
+
+
+class SearchTests(BlogTestCase):
+
+    def search(self, q):
+        return APIClient().get('/api/v1/posts/search/', {'q': q})
+
+    def test_query_is_required(self):
+        self.assertEqual(self.search('  ').status_code, 400)
+
+    def test_terms_may_be_split_across_title_and_body(self):
+        post = make_post(self.author, self.category, title='Django tips', body='Caching querysets in views')
+        make_post(self.author, self.category, title='Flask tips', body='Nothing about that')
+        response = self.search('django caching')
+        self.assertEqual([row['id'] for row in response.data['results']], [post.pk])
+
+    def test_title_matches_rank_first(self):
+        in_body = make_post(self.author, self.category, title='Weekly notes', body='a short word on postgres')
+        in_title = make_post(self.author, self.category, title='Postgres indexes', body='b-trees and more')
+        response = self.search('postgres')
+        self.assertEqual([row['id'] for row in response.data['results']], [in_title.pk, in_body.pk])
+        self.assertIn('<mark>', response.data['results'][1]['headline'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'tsvector search needs PostgreSQL')
+    def test_postgres_search_uses_the_stored_vector(self):
+        post = make_post(self.author, self.category, title='Running', body='Runners run every morning')
+        response = self.search('run')  # stemmed
+        self.assertEqual([row['id'] for row in response.data['results']], [post.pk])
+
+
+@mock.patch('blogs.signals.uses_postgres_search', return_value=True)
+@mock.patch('blogs.signals.post_search_vector', return_value=Value(None))
+class SearchVectorUpkeepTests(BlogTestCase):
+    """The vector expression is replaced by NULL, only whether the UPDATE runs is checked."""
+
+    def test_new_post_gets_a_vector(self, vector, _):
+        make_post(self.author, self.category)
+        self.assertEqual(vector.call_count, 1)
+
+    def test_only_text_changes_refresh_it(self, vector, _):
+        post = BlogPost.objects.get(pk=make_post(self.author, self.category).pk)
+        vector.reset_mock()
+        post.is_premium = True
+        post.save()
+        post.save(update_fields=['is_active'])
+        self.assertEqual(vector.call_count, 0)
+
+        post.body = 'A new body'
+        post.save()
+        post.title = 'A new title'
+        post.save(update_fields=['title'])
+        self.assertEqual(vector.call_count, 2)
+
+    def test_deferred_body_is_not_compared(self, vector, _):
+        post = BlogPost.objects.defer('body').get(pk=make_post(self.author, self.category).pk)
+        vector.reset_mock()
+        post.save()
+        self.assertEqual(vector.call_count, 0)
+
+
+class BackfillSearchVectorCommandTests(BlogTestCase):
+
+    @skipIf(connection.vendor == 'postgresql', 'checks the non-postgres path')
+    def test_nothing_to_do_without_postgres(self):
+        out = StringIO()
+        call_command('backfill_search_vector', stdout=out)
+        self.assertIn('Nothing to do', out.getvalue())
+
+    @skipUnless(connection.vendor == 'postgresql', 'tsvector search needs PostgreSQL')
+    def test_fills_empty_vectors(self):
+        posts = [make_post(self.author, self.category, title=f'Post {n}') for n in range(3)]
+        BlogPost.objects.update(search_vector=None)
+        out = StringIO()
+        call_command('backfill_search_vector', batch_size=2, stdout=out)
+        self.assertIn('Backfilled search_vector on 3 post(s)', out.getvalue())
+        self.assertFalse(BlogPost.objects.filter(pk__in=[p.pk for p in posts], search_vector__isnull=True).exists())
+
+
+class LikeListingTests(BlogTestCase):
+
+    def setUp(self):
+        self.post = make_post(self.author, self.category)
+        self.readers = [User.objects.create_user(username=f'reader{n}', email=f'r{n}@example.com', password='x') for n in range(4)]
+        for reader in self.readers:
+            self.client_for(reader).post(f'/api/v1/posts/{self.post.pk}/likes/')
+
+    def test_listing_is_one_joined_query(self):
+        client = self.client_for(self.author)
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/v1/posts/{self.post.pk}/likes/')
+        self.assertEqual([row['username'] for row in response.data['results']], ['reader3', 'reader2', 'reader1', 'reader0'])
+
+    def test_summary(self):
+        response = self.client_for(self.readers[0]).get(f'/api/v1/posts/{self.post.pk}/likes/summary/', {'limit': 2})
+        self.assertEqual(response.data, {
+            'post': self.post.pk, 'like_count': 4, 'is_liked_by_me': True, 'recent_likers': ['reader3', 'reader2'],
+        })
+        response = APIClient().get(f'/api/v1/posts/{self.post.pk}/likes/summary/', {'limit': 500})
+        self.assertEqual((response.data['is_liked_by_me'], len(response.data['recent_likers'])), (False, 4))
+
+    def test_unknown_post_is_404(self):
+        for post_pk in ('999999', 'abc'):
+            with self.subTest(post_pk):
+                self.assertEqual(APIClient().get(f'/api/v1/posts/{post_pk}/likes/summary/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/v1/posts/abc/likes/').status_code, 404)
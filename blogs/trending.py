@@ -0,0 +1,92 @@
+# blogs, trending.py:
+# time-decayed post scores. an event of weight w at time t is worth w * 2^(-(now - t) / half_life) now.
+# all terms share the factor 2^(-now / half_life), so ranking by  S = log2(sum of w * 2^((t - EPOCH) / half_life))
+# is the same as ranking by the decayed sum at any moment: old rows never need rewriting, S can be indexed,
+# and adding an event is one UPDATE (log-add in SQL). every post starts with one creation event (weight 1).
+# unlikes / deleted comments are not subtracted, `manage.py recompute_post_scores` rebuilds exact scores.
+import math
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+from .models import BlogPost, PostScore
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+POST_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+
+def half_life_seconds():
+    return getattr(settings, "TRENDING_HALF_LIFE_HOURS", 24) * 3600
+
+
+def event_score(weight, at):
+    """log2 of one event's epoch-anchored contribution."""
+    return math.log2(weight) + (at - EPOCH).total_seconds() / half_life_seconds()
+
+
+def log_add(*scores):
+    """log2(2^a + 2^b + ...), shifted by the max so it never overflows."""
+    top = max(scores)
+    return top + math.log2(sum(2 ** (s - top) for s in scores))
+
+
+def _log_add_expression(field, value):
+    """SQL for log_add(field, value): greatest + log2(1 + 2^-|field - value|)."""
+    value = Value(value)
+    return Greatest(F(field), value) + Log(Value(2.0), Value(1.0) + Power(Value(2.0), -Abs(F(field) - value)))
+
+
+def create_post_score(post):
+    PostScore.objects.create(
+        post=post, score=event_score(POST_WEIGHT, post.created_at),
+        is_active=post.is_active, is_premium=post.is_premium,
+    )
+
+
+def record_engagement(post_id, weight, at=None):
+    """Add a like / comment to the post's score, one UPDATE."""
+    value = event_score(weight, at or timezone.now())
+    updated = PostScore.objects.filter(post_id=post_id).update(score=_log_add_expression("score", value))
+    if not updated:  # post without a score row yet
+        post = BlogPost.objects.filter(pk=post_id).only("created_at", "is_active", "is_premium").first()
+        if post is not None:
+            PostScore.objects.bulk_create([PostScore(
+                post=post, score=log_add(event_score(POST_WEIGHT, post.created_at), value),
+                is_active=post.is_active, is_premium=post.is_premium,
+            )], ignore_conflicts=True)
+
+
+def sync_visibility(post):
+    PostScore.objects.filter(post_id=post.pk).update(is_active=post.is_active, is_premium=post.is_premium)
+
+
+def rebuild_scores(post_model, like_model, comment_model, score_model, batch_size=500):
+    """
+    Exact scores for every post from its likes and comments, written in pk-ranged batches.
+    Takes the model classes so the migration can run it on historical models. Returns the number of posts.
+    """
+    total, last_pk = 0, 0
+    while True:
+        posts = list(
+            post_model.objects.filter(pk__gt=last_pk).order_by("pk")
+            .values("pk", "created_at", "is_active", "is_premium")[:batch_size]
+        )
+        if not posts:
+            return total
+        last_pk = posts[-1]["pk"]
+        terms = {p["pk"]: [event_score(POST_WEIGHT, p["created_at"])] for p in posts}
+        for model, weight in ((like_model, LIKE_WEIGHT), (comment_model, COMMENT_WEIGHT)):
+            for post_id, created_at in model.objects.filter(post_id__in=terms).values_list("post_id", "created_at").iterator():
+                terms[post_id].append(event_score(weight, created_at))
+
+        rows = [
+            score_model(post_id=p["pk"], score=log_add(*terms[p["pk"]]), is_active=p["is_active"], is_premium=p["is_premium"])
+            for p in posts
+        ]
+        score_model.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["post"], update_fields=["score", "is_active", "is_premium", "updated_at"],
+        )
+        total += len(rows)
@@ -2,9 +2,23 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
 from drf_yasg.utils import swagger_auto_schema
 from .models import BlogPost, Comment, Like
-from .serializers import BlogPostSerializer, CommentSerializer, LikeSerializer
+from rest_framework.pagination import PageNumberPagination
+from .serializers import BlogPostSerializer, BlogPostSearchSerializer, CommentSerializer, LikeSerializer
+from .pagination import CreatedAtCursorPagination
+from .search import search_posts
+from .trending import LIKE_WEIGHT, record_engagement
+from .author_stats import like_changed
+from core.response_cache import NAMESPACE_POSTS, cache_response
+from core.conditional import ConditionalGetMixin
+from core.sparse_fields import SparseFieldsViewMixin
+from core.export import OUTPUTS as EXPORT_OUTPUTS, OUTPUT_PARAM as EXPORT_OUTPUT_PARAM, stream_export
+from core.query_budget import QueryBudgetMixin
+from payment.entitlements import has_premium_access
 from drf_yasg import openapi
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -24,21 +38,38 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     operation_summary="BlogPost endpoints",
     operation_description="Endpoints for managing blog posts"
 )
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(QueryBudgetMixin, ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = BlogPost.objects.select_related("author", "category").filter(is_active=True)  # Filter active posts
     serializer_class = BlogPostSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
+    query_budget = 10
+    # counters change without touching updated_at, author_username / category_name are versioned by the joined rows
+    etag_fields = ("updated_at", "like_count", "comment_count", "author__auth_version", "category__updated_at")
+    always_load_fields = ("created_at", "updated_at", "like_count", "comment_count") # cursor position and ETag, whatever ?fields= says
+    trending_limit = 10 # default ?limit= for trending
+    max_trending_limit = 50
+    export_fields = (
+        "id", "title", "body", "excerpt", "image", "video_url", "author_id", "author__username", "category_id", "category__name",
+        "is_active", "is_premium", "like_count", "comment_count", "reading_time_minutes", "created_at", "updated_at",
+    )
     
     def get_queryset(self):
         """
         Optionally restricts the returned posts to active ones,
         by filtering against the `is_active` field.
         Staff users can see all posts.
+        Authenticated users also get `is_liked_by_me`, optionally filtered with ?liked_by_me=true|false.
+        ?fields= / ?omit= on reads defer the unused columns (e.g. ?omit=body never loads bodies).
         """
         if getattr(self, 'swagger_fake_view', False):
             return BlogPost.objects.none()
             
-        queryset = BlogPost.objects.select_related("author", "category")
+        queryset = self.post_queryset()
+
+        liked_by_me = self.request.query_params.get('liked_by_me')
+        if liked_by_me is not None and self.request.user.is_authenticated:
+            queryset = queryset.filter(is_liked_by_me=liked_by_me.lower() in ('1', 'true', 'yes'))
         
         # Staff users can see all posts
         if self.request.user.is_staff:
@@ -47,11 +78,33 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         # Regular users only see active posts
         return queryset.filter(is_active=True)
 
+    def post_queryset(self):
+        """Base queryset for every read: joins, is_liked_by_me, search_vector never loaded."""
+        queryset = self.annotate_liked_by_me(
+            BlogPost.objects.select_related("author", "category").defer("search_vector")
+        )
+        if self.action != 'search': # search headlines need the body
+            queryset = self.defer_unused_fields(queryset)
+        return queryset
+
+    def annotate_liked_by_me(self, queryset):
+        """One EXISTS subquery per post in the same SELECT, instead of a likes request per post."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(is_liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user=user)))
+
+    def get_etag_fields(self):
+        if self.request.user.is_authenticated:
+            return self.etag_fields + ("is_liked_by_me",)
+        return self.etag_fields
+
     @swagger_auto_schema(
         operation_summary="List all posts",
         operation_description="GET /api/v1/posts/",
         responses={200: BlogPostSerializer(many=True)}
     )
+    @cache_response(NAMESPACE_POSTS, anonymous_only=True)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -103,53 +156,160 @@ class BlogPostViewSet(viewsets.ModelViewSet):
     #
     @swagger_auto_schema(
         operation_summary="Get free blogs",
-        operation_description="GET /api/v1/posts/free-blogs/ - Get all active non-premium blogs",
-        responses={200: BlogPostSerializer(many=True)}
+        operation_description="GET /api/v1/posts/free-blogs/ - Active non-premium blogs, newest first, one cursor page at a time",
+        responses={
+            200: openapi.Response(
+                description="One page of posts, follow `next` for the following page",
+                examples={"application/json": {"next": "http://localhost:8000/api/v1/posts/free-blogs/?cursor=cD0yMDI2", "previous": None, "results": []}}
+            )
+        }
     )
     @action(detail=False, methods=['get'], url_path='free-blogs')
+    @cache_response(NAMESPACE_POSTS, anonymous_only=True)
     def get_free_blogs(self, request):
         """
-        Get all active non-premium blogs
+        Active non-premium blogs, one page of {next, previous, results}
         """
         if getattr(self, 'swagger_fake_view', False):
             return Response([])
             
-        queryset = BlogPost.objects.select_related("author", "category").filter(
+        # one (created_at, id) keyset page, a range scan of the partial (is_premium, created_at, id) WHERE is_active index
+        queryset = self.filter_queryset(self.post_queryset().filter(
             is_active=True, 
             is_premium=False
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        ))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     #
     @swagger_auto_schema(
         operation_summary="Get premium blogs",
-        operation_description="GET /api/v1/posts/premium-blogs/ - Get all active premium blogs (subscribed users only)",
+        operation_description="GET /api/v1/posts/premium-blogs/ - Active premium blogs, newest first, one cursor page at a time (subscribed users only)",
         responses={
-            200: BlogPostSerializer(many=True),
+            200: openapi.Response(
+                description="One page of posts, follow `next` for the following page",
+                examples={"application/json": {"next": "http://localhost:8000/api/v1/posts/premium-blogs/?cursor=cD0yMDI2", "previous": None, "results": []}}
+            ),
             403: "Forbidden - Subscription required"
         }
     )
     @action(detail=False, methods=['get'], url_path='premium-blogs')
     def get_premium_blogs(self, request):
         """
-        Get all active premium blogs (subscribed users only)
+        Active premium blogs, one page of {next, previous, results} (subscribed users only)
         """
         if getattr(self, 'swagger_fake_view', False):
             return Response([])
             
-        # Check if user is subscribed
-        if not request.user.is_subscribed and not request.user.is_staff:
+        # staff, or subscribed with an unexpired subscription (payment/entitlements.py, cached per process)
+        if not has_premium_access(request.user):
             return Response(
                 {"detail": "You need an active subscription to access premium content."},
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        queryset = BlogPost.objects.select_related("author", "category").filter(
+        queryset = self.filter_queryset(self.post_queryset().filter(
             is_active=True, 
             is_premium=True
-        )
+        ))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    #
+    @swagger_auto_schema(
+        operation_summary="Get posts liked by me",
+        operation_description="GET /api/v1/posts/liked-posts/ - Posts the current user has liked",
+        responses={200: BlogPostSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='liked-posts', permission_classes=[permissions.IsAuthenticated])
+    def liked_posts(self, request):
+        """
+        Get the posts the current user has liked, newest post first
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response([])
+
+        queryset = self.filter_queryset(self.get_queryset().filter(is_liked_by_me=True))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    #
+    @swagger_auto_schema(
+        operation_summary="Search posts",
+        operation_description="GET /api/v1/posts/search/?q=... - Full-text search, best match first, with highlighted snippets",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Search terms", type=openapi.TYPE_STRING, required=True)
+        ],
+        responses={200: BlogPostSearchSerializer(many=True), 400: "Missing search query"}
+    )
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Full-text search over title and body.
+        Ordered by relevance, so it pages by page number instead of the created_at cursor.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response([])
+
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = search_posts(self.get_queryset(), q)
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = BlogPostSearchSerializer(page, many=True, context={**self.get_serializer_context(), "search_query": q})
+        return paginator.get_paginated_response(serializer.data)
+    #
+    @swagger_auto_schema(
+        operation_summary="Trending posts",
+        operation_description="GET /api/v1/posts/trending/?limit=10 - Top posts by time-decayed likes and comments (max 50)",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Number of posts, default 10, max 50", type=openapi.TYPE_INTEGER)
+        ],
+        responses={200: BlogPostSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='trending')
+    @cache_response(NAMESPACE_POSTS, anonymous_only=True)
+    def trending(self, request):
+        """
+        Top N by PostScore.score, one query walking the (is_active, [is_premium,] -score) index.
+        Premium posts are listed only for users with premium access.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response([])
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.trending_limit)), 1), self.max_trending_limit)
+        except ValueError:
+            limit = self.trending_limit
+
+        queryset = self.post_queryset().filter(post_score__is_active=True)
+        if not has_premium_access(request.user):
+            queryset = queryset.filter(post_score__is_premium=False)
+        queryset = queryset.order_by('-post_score__score')[:limit]
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)  
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_summary="Export all posts (staff)",
+        operation_description="GET /api/v1/posts/export/?output=ndjson|csv - Every post, inactive included, streamed in pk order",
+        manual_parameters=[openapi.Parameter('output', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=EXPORT_OUTPUTS, default='ndjson')],
+        responses={200: "NDJSON or CSV file"}
+    )
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Streamed dump for analytics, values() rows from a server-side cursor (core/export.py).
+        Memory stays flat however many posts there are.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response([])
+
+        output = request.query_params.get(EXPORT_OUTPUT_PARAM, 'ndjson')
+        if output not in EXPORT_OUTPUTS:
+            return Response({"detail": f"'{EXPORT_OUTPUT_PARAM}' must be one of: {', '.join(EXPORT_OUTPUTS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        return stream_export(BlogPost.objects.order_by('pk'), self.export_fields, output, 'posts')
  
 """
 BlogPostViewSet endpoints:
@@ -159,12 +319,24 @@ BlogPostViewSet endpoints:
     PUT    /api/v1/posts/{id}/     - full update post
     PATCH  /api/v1/posts/{id}/     - partial update post
     DELETE /api/v1/posts/{id}/     - delete post
+    GET    /api/v1/posts/free-blogs/ - active non-premium posts, paginated
+    GET    /api/v1/posts/premium-blogs/ - active premium posts, paginated (subscribers and staff)
+    GET    /api/v1/posts/search/?q= - full-text search
+    GET    /api/v1/posts/liked-posts/ - posts liked by the current user
+    GET    /api/v1/posts/trending/?limit= - top posts by time-decayed engagement
+    GET    /api/v1/posts/export/?output=ndjson|csv - streamed dump of every post (staff)
+
+free-blogs and premium-blogs used to return a bare list of every post, they now return
+{"next", "previous", "results"} like the list endpoint, clients must read `results` and follow `next`.
 """
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryBudgetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
+    query_budget = 10
+    etag_fields = ("updated_at", "author__auth_version") # author_username, auth_version is bumped on username changes
 
     @swagger_auto_schema(
         operation_summary="List comments for a post",
@@ -220,7 +392,7 @@ class CommentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):        
         if getattr(self, 'swagger_fake_view', False): # if we're in schema generation mode            
             return Comment.objects.none()  # empty queryset during schema generation
-        return Comment.objects.filter(post_id=self.kwargs['post_pk'])
+        return Comment.objects.select_related('author').filter(post_id=self.kwargs['post_pk']) # author_username
 
     def perform_create(self, serializer):
         post = BlogPost.objects.get(pk=self.kwargs['post_pk'])
@@ -237,11 +409,17 @@ CommentViewSet endpoints:
 """
 
 
-class LikeViewSet(viewsets.ViewSet):
+class LikeViewSet(QueryBudgetMixin, viewsets.ViewSet):
     """
-    GET    /api/v1/posts/{post_pk}/likes/   - list likes
-    POST   /api/v1/posts/{post_pk}/likes/   - toggle like
+    GET    /api/v1/posts/{post_pk}/likes/           - list likes (paginated)
+    POST   /api/v1/posts/{post_pk}/likes/           - toggle like
+    GET    /api/v1/posts/{post_pk}/likes/summary/   - count, liked by me, recent likers
     """
+    pagination_class = CreatedAtCursorPagination
+    query_budget = 10
+    summary_likers = 3 # default ?limit= for summary
+    max_summary_likers = 20
+
     @swagger_auto_schema(
         operation_summary="List likes for a post",
         operation_description="GET /api/v1/posts/{post_pk}/likes/",
@@ -250,8 +428,17 @@ class LikeViewSet(viewsets.ViewSet):
     def list(self, request, post_pk=None):
         if getattr(self, 'swagger_fake_view', False):
             return Response([])
-        likes = Like.objects.filter(post_id=post_pk)
-        return Response(LikeSerializer(likes, many=True).data)
+        if not post_pk.isdigit():
+            return Response({"detail": "Post not found."}, status=status.HTTP_404_NOT_FOUND)
+        # one joined query, only the columns LikeSerializer reads
+        likes = (
+            Like.objects.select_related('user')
+            .only('id', 'post_id', 'user_id', 'created_at', 'user__username')
+            .filter(post_id=post_pk)
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(likes, request, view=self)
+        return paginator.get_paginated_response(LikeSerializer(page, many=True).data)
 
     @swagger_auto_schema(
     operation_summary="Toggle like on post",
@@ -268,13 +455,71 @@ class LikeViewSet(viewsets.ViewSet):
     }
     )
     def create(self, request, post_pk=None):
-        post = BlogPost.objects.get(pk=post_pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        if not created:
-            like.delete()
-            return Response({'liked': False}, status=status.HTTP_200_OK)
+        post = get_object_or_404(BlogPost, pk=post_pk)
+        # toggle and counter update commit together, F() keeps concurrent toggles from losing updates
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if not created:
+                deleted, _ = like.delete()
+                if deleted: # a concurrent unlike of the same like may have removed it first
+                    BlogPost.objects.filter(pk=post.pk, like_count__gt=0).update(like_count=F("like_count") - 1)
+                    like_changed(post, -1)
+                return Response({'liked': False}, status=status.HTTP_200_OK)
+            BlogPost.objects.filter(pk=post.pk).update(like_count=F("like_count") + 1)
+            record_engagement(post.pk, LIKE_WEIGHT)
+            like_changed(post, +1)
         return Response({'liked': True}, status=status.HTTP_201_CREATED)
 
+    @swagger_auto_schema(
+        operation_summary="Likes summary for a post",
+        operation_description="GET /api/v1/posts/{post_pk}/likes/summary/?limit=3",
+        responses={
+            200: openapi.Response(
+                description="Likes summary",
+                examples={"application/json": {"post": 1, "like_count": 12, "is_liked_by_me": True, "recent_likers": ["anup", "nax", "few"]}}
+            ),
+            404: "Post not found"
+        }
+    )
+    @action(detail=False, methods=['get'], url_path='summary')
+    def summary(self, request, post_pk=None):
+        """
+        Two queries: the post's denormalized like_count with an EXISTS for the current user,
+        then the newest likers' usernames from the (post, created_at, id) index.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response({})
+
+        try:
+            post_pk = int(post_pk)
+        except ValueError: # /posts/abc/likes/summary/
+            return Response({"detail": "Post not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = min(int(request.query_params.get('limit', self.summary_likers)), self.max_summary_likers)
+        except ValueError:
+            limit = self.summary_likers
+
+        post = BlogPost.objects.filter(pk=post_pk)
+        if request.user.is_authenticated:
+            post = post.annotate(is_liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user=request.user)))
+            post = post.values('like_count', 'is_liked_by_me').first()
+        else:
+            post = post.values('like_count').first()
+        if post is None:
+            return Response({"detail": "Post not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        recent_likers = list(
+            Like.objects.filter(post_id=post_pk)
+            .order_by('-created_at', '-id')
+            .values_list('user__username', flat=True)[:max(limit, 0)]
+        ) if post['like_count'] else []
+        return Response({
+            "post": post_pk,
+            "like_count": post['like_count'],
+            "is_liked_by_me": post.get('is_liked_by_me', False),
+            "recent_likers": recent_likers,
+        })
+
 
 """
 crate post example
@@ -300,6 +545,8 @@ body:
     "category": 1,
     "category_name": "Programming",
     "created_at": "2025-08-13T15:15:22.648352Z",
-    "updated_at": "2025-08-13T15:15:22.648352Z"
+    "updated_at": "2025-08-13T15:15:22.648352Z",
+    "like_count": 0,
+    "comment_count": 0
 }
 """
@@ -4,6 +4,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # versions category_name in post ETags (core/conditional.py)
 
     class Meta:        
         ordering = ["name"]
@@ -2,7 +2,12 @@ from rest_framework import serializers
 from .models import Category
 
 class CategorySerializer(serializers.ModelSerializer):
+    # annotated by CategoryViewSet.get_queryset, active posts only
+    post_count = serializers.IntegerField(read_only=True, default=0)
+    premium_count = serializers.IntegerField(read_only=True, default=0)
+    latest_post_at = serializers.DateTimeField(read_only=True, default=None)
+
     class Meta:
         model = Category
-        fields = ["id", "name", "description", "created_at"]
+        fields = ["id", "name", "description", "created_at", "post_count", "premium_count", "latest_post_at"]
         read_only_fields = ["id", "created_at"]
\ No newline at end of file
@@ -0,0 +1,13 @@
+# categories, signals.py:
+# invalidate cached list responses when a category changes.
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.response_cache import NAMESPACE_CATEGORIES, NAMESPACE_POSTS, invalidate
+from .models import Category
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_category_lists(sender, instance, **kwargs):
+    """Category lists change, and post lists embed category_name."""
+    invalidate(NAMESPACE_CATEGORIES, NAMESPACE_POSTS)
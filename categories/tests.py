@@ -1,3 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from blogs.models import BlogPost
+from .models import Category
+
+User = get_user_model()
+
+
+class CategoryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="writer", email="writer@example.com", password="x")
+        cls.tech = Category.objects.create(name="Tech")
+        cls.empty = Category.objects.create(name="Empty")
+
+    def post(self, category, **fields):
+        return BlogPost.objects.create(author=self.author, category=category, title="Post", body="Body", **fields)
+
+    def categories(self):
+        response = APIClient().get("/api/v1/categories/")
+        return {row["name"]: row for row in response.data["results"]}
+
+    def test_counts_cover_active_posts_only(self):
+        self.post(self.tech)
+        latest = self.post(self.tech, is_premium=True)
+        self.post(self.tech, is_active=False)
+
+        tech, empty = self.categories()["Tech"], self.categories()["Empty"]
+        self.assertEqual((tech["post_count"], tech["premium_count"]), (2, 1))
+        self.assertEqual(parse_datetime(tech["latest_post_at"]), latest.created_at)
+        self.assertEqual((empty["post_count"], empty["premium_count"], empty["latest_post_at"]), (0, 0, None))
+
+    def test_moved_and_deactivated_posts_are_recounted(self):
+        post = self.post(self.tech)
+        post.category = self.empty
+        post.save()
+        self.assertEqual([self.categories()[name]["post_count"] for name in ("Tech", "Empty")], [0, 1])
+        post.is_active = False
+        post.save()
+        self.assertEqual(self.categories()["Empty"]["post_count"], 0)
+
+    def test_query_count_does_not_grow_with_categories(self):
+        self.post(self.tech)
+        with CaptureQueriesContext(connection) as few:
+            self.categories()
+        for n in range(5):
+            self.post(Category.objects.create(name=f"More {n}"))
+        with self.assertNumQueries(len(few)):
+            self.assertEqual(len(self.categories()), 7)
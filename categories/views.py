@@ -1,8 +1,11 @@
 from rest_framework import viewsets, permissions
+from django.db.models import Count, Max, Q
 from .models import Category
 from .serializers import CategorySerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from core.response_cache import NAMESPACE_CATEGORIES, cache_response
+from core.query_budget import QueryBudgetMixin
 
 class IsStaffOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -10,16 +13,27 @@ class IsStaffOrReadOnly(permissions.BasePermission):
             return True
         return request.user and request.user.is_staff
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsStaffOrReadOnly]
+    query_budget = 5
+
+    def get_queryset(self):
+        """Sidebar counts in the same query: one GROUP BY over active posts, no request per category."""
+        active = Q(posts__is_active=True)
+        return Category.objects.annotate(
+            post_count=Count("posts", filter=active),
+            premium_count=Count("posts", filter=active & Q(posts__is_premium=True)),
+            latest_post_at=Max("posts__created_at", filter=active),
+        ).order_by("name")  # Meta.ordering is not applied to aggregate queries
     
     @swagger_auto_schema(
         operation_summary="List all categories",
         operation_description="GET /api/v1/categories/",
         responses={200: CategorySerializer(many=True)}
     )
+    @cache_response(NAMESPACE_CATEGORIES)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
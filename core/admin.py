@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import OrphanedImage, QueuedEmail
 
-# Register your models here.
+@admin.register(OrphanedImage)
+class OrphanedImageAdmin(admin.ModelAdmin):
+    list_display = ("public_id", "attempts", "next_attempt_at", "created_at")
+    search_fields = ("public_id",)
+    readonly_fields = ("created_at",)
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "from_email", "attempts", "next_attempt_at", "created_at")
+    search_fields = ("subject", "to")
+    readonly_fields = ("created_at",)
@@ -0,0 +1,103 @@
+# core, conditional.py:
+# ETag / Last-Modified for read endpoints, so polling clients get a 304 instead of the full body.
+# retrieve: the validators come from one narrow values() query run before the object is loaded.
+# list: they come from the rows of the fetched page (no extra query, nothing scanned beyond the page),
+# a matching If-None-Match / If-Modified-Since request skips serialization and sends no body.
+import hashlib
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_validators(request, values, updated_at, extra=""):
+    """
+    Strong ETag and Last-Modified timestamp.
+    The ETag covers `values` (a dict of validator columns or aggregates), the request path/query and the
+    representation format, Last-Modified is `updated_at` (None for an empty result).
+    """
+    renderer = getattr(getattr(request, "accepted_renderer", None), "format", "")
+    source = f"{request.get_full_path()}|{renderer}|{extra}|{sorted(values.items())!r}"
+    etag = '"%s"' % hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    return etag, last_modified
+
+
+def field_value(instance, name):
+    """Value of an etag_fields entry on a loaded instance, "author__auth_version" follows the relation."""
+    for part in name.split("__"):
+        if instance is None:
+            return None
+        instance = getattr(instance, part)
+    return instance
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, etag, last_modified):
+    """304 (or 412) response if the request's preconditions match, else None."""
+    django_request = getattr(request, "_request", request)
+    headers = set_validators(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(django_request, etag=etag, last_modified=last_modified, response=headers)
+    return None if response is headers else response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified to `retrieve` and `list` of a GenericViewSet.
+    - retrieve: one narrow values() query on the row's `etag_fields`, body is loaded only on a miss
+    - list: the page is fetched as usual, the ETag covers its rows' pk and `etag_fields` plus the page links,
+      only serialization is skipped on a match. a change outside the page leaves the page's ETag alone.
+    `etag_fields` must include `updated_at` plus any column that changes without touching it, and a version of
+    each joined value the serializer shows (e.g. "category__updated_at" for category_name). on the list they are
+    read from the page's instances, so they must be loaded there (select_related, never deferred).
+    Only use on viewsets whose safe-method object permissions add nothing beyond get_queryset().
+    """
+    etag_fields = ("updated_at",)
+
+    def get_etag_fields(self):
+        """Validator columns, override to add per-request annotations."""
+        return self.etag_fields
+
+    def get_etag_extra(self, request):
+        """Extra ETag input, the user by default since serializers may personalise the output."""
+        user = getattr(request, "user", None)
+        return str(user.pk) if user is not None and user.is_authenticated else ""
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        row = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values("pk", *self.get_etag_fields()).first()
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)  # normal 404 path
+
+        etag, last_modified = make_validators(request, row, row["updated_at"], self.get_etag_extra(request))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        fields = self.get_etag_fields()
+        values = {"rows": [(row.pk, *(field_value(row, name) for name in fields)) for row in rows]}
+        if page is not None: # a row added or removed past either end of the page changes the links
+            values["links"] = (self.paginator.get_next_link(), self.paginator.get_previous_link())
+        updated_at = max((row.updated_at for row in rows), default=None)
+        etag, last_modified = make_validators(request, values, updated_at, self.get_etag_extra(request))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(rows, many=True).data)
+        return set_validators(response, etag, last_modified)
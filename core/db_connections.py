@@ -0,0 +1,58 @@
+# core, db_connections.py:
+# connection settings for the serverless (Vercel / Lambda) deployment, applied to DATABASES in settings.py.
+# a warm instance should reuse its Postgres connection instead of paying TCP + TLS + auth to Supabase on every request.
+# modes (DB_CONNECTION_MODE):
+#   'per_request'  CONN_MAX_AGE=0, a new connection per request (Django's default)
+#   'persistent'   keep the connection for CONN_MAX_AGE seconds, CONN_HEALTH_CHECKS pings it before reuse after
+#                  an idle gap, so a connection dropped while the instance was frozen is replaced, not failed on
+#   'pool'         psycopg 3 connection pool in the process (Django 5.1+, needs psycopg[pool]). falls back to
+#                  'persistent' with a warning when psycopg / psycopg_pool are not installed (psycopg2 has no pool)
+# transaction_pooler=True for PgBouncer / Supavisor in transaction mode (Supabase pooler, port 6543): consecutive
+# transactions may run on different server connections, so nothing may rely on session state:
+#   - server-side cursors are disabled (a named cursor lives in the session), core/export.py then walks pk ranges
+#   - psycopg 3 never prepares statements (prepared statements are per session)
+#   - the database's default TimeZone must be UTC (Supabase's is), else Django issues a session-level SET TIME ZONE
+# this module is imported by settings.py, it must not import models.
+import importlib.util
+import warnings
+
+MODES = ("per_request", "persistent", "pool")
+
+
+def psycopg3_available():
+    return importlib.util.find_spec("psycopg") is not None
+
+
+def pool_available():
+    return psycopg3_available() and importlib.util.find_spec("psycopg_pool") is not None
+
+
+def configure_connections(database, mode="persistent", max_age=60, transaction_pooler=False, pool_options=None):
+    """Copy of a DATABASES entry set up for `mode`, only PostgreSQL entries are changed."""
+    if mode not in MODES:
+        raise ValueError(f"DB_CONNECTION_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+    database = {**database, "OPTIONS": dict(database.get("OPTIONS", {}))}
+    if "postgresql" not in database.get("ENGINE", ""):
+        return database
+
+    if mode == "pool" and not pool_available():
+        warnings.warn("DB_CONNECTION_MODE='pool' needs psycopg[pool], using 'persistent' connections", RuntimeWarning)
+        mode = "persistent"
+
+    if mode == "pool":
+        database["CONN_MAX_AGE"] = 0  # the pool owns connection lifetime, Django refuses persistent + pool
+        from psycopg_pool import ConnectionPool
+        database["OPTIONS"]["pool"] = {
+            "min_size": 1, "max_size": 4, "max_idle": max_age or 60,
+            "check": ConnectionPool.check_connection,  # health check on checkout, like CONN_HEALTH_CHECKS
+            **(pool_options or {}),
+        }
+    else:
+        database["CONN_MAX_AGE"] = 0 if mode == "per_request" else max_age
+        database["CONN_HEALTH_CHECKS"] = mode == "persistent"
+
+    if transaction_pooler:
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+        if psycopg3_available():
+            database["OPTIONS"]["prepare_threshold"] = None
+    return database
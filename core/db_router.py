@@ -0,0 +1,157 @@
+# core, db_router.py:
+# primary / read-replica routing (settings.DATABASE_REPLICAS, aliases in DATABASES).
+# - ReplicaRoutingMiddleware lets the reads of a safe-method request (GET, HEAD, OPTIONS) go to a replica.
+#   everything else, and code running outside a request (commands, migrations, shell, threads), uses the primary.
+# - writes always go to the primary. the first write of a request moves its remaining reads to the primary,
+#   and reads inside an atomic block on the primary stay there too.
+# - after a request that wrote (or used an unsafe method) the client is pinned to the primary for
+#   REPLICA_STICKY_SECONDS, so it reads its own writes while the replicas catch up. API clients are recognised
+#   by their Authorization header (pin kept in the REPLICA_PIN_CACHE_ALIAS cache), browsers by a short-lived cookie.
+# - each replica's lag is measured at most every REPLICA_LAG_CHECK_SECONDS per process. a replica more than
+#   REPLICA_MAX_LAG_SECONDS behind, or unreachable, is skipped until the next check; no healthy replica = primary.
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_COOKIE = "db_pin"
+PRIMARY = "primary"
+REPLICA = "replica"
+# 0 while the replica has replayed everything it received, else the age of the last replayed transaction
+PG_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_route = ContextVar("db_route", default=PRIMARY)
+_wrote = ContextVar("db_wrote", default=False)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+class ReplicaHealth:
+    """alias -> (healthy, checked at monotonic time), per process. One thread measures, the others keep the last answer."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def healthy(self, aliases):
+        now = time.monotonic()
+        return [alias for alias in aliases if self._is_healthy(alias, now)]
+
+    def _is_healthy(self, alias, now):
+        entry = self._checked.get(alias)
+        if entry is None or now - entry[1] >= getattr(settings, "REPLICA_LAG_CHECK_SECONDS", 5):
+            if self._lock.acquire(blocking=False):
+                try:
+                    entry = self._checked[alias] = (self.lag(alias) <= getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2), now)
+                finally:
+                    self._lock.release()
+            elif entry is None:
+                return False  # being measured right now, use the primary meanwhile
+        return entry[0]
+
+    def lag(self, alias):
+        """Seconds behind the primary, infinity when the replica cannot be queried."""
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            return 0.0  # local setups point the replica alias at the same database
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PG_LAG_SQL)
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError as e:
+            logger.warning("replica %s unavailable, reading from the primary: %s", alias, e)
+            return float("inf")
+        if lag > getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2):
+            logger.warning("replica %s is %.1fs behind, reading from the primary", alias, lag)
+        return lag
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _route.get() != REPLICA or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = health.healthy(replica_aliases())
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # read-your-writes for the rest of the request, and the middleware pins the client
+        _route.set(PRIMARY)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False  # replicated from the primary
+        return None
+
+
+def client_pin_key(request):
+    auth = request.META.get("HTTP_AUTHORIZATION")
+    return "dbpin:" + hashlib.sha256(auth.encode()).hexdigest() if auth else None
+
+
+def pin_cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+
+def is_pinned(request, key):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    return key is not None and pin_cache().get(key) is not None
+
+
+def pin(response, key):
+    seconds = sticky_seconds()
+    response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax")
+    if key is not None:
+        pin_cache().set(key, 1, seconds)
+
+
+class ReplicaRoutingMiddleware:
+    """Marks which requests may read from a replica, pins clients to the primary after they write."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        key = client_pin_key(request)
+        use_replica = request.method in SAFE_METHODS and not is_pinned(request, key)
+        route, wrote = _route.set(REPLICA if use_replica else PRIMARY), _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() or request.method not in SAFE_METHODS:
+                pin(response, key)
+        finally:
+            _route.reset(route)
+            _wrote.reset(wrote)
+        return response
@@ -0,0 +1,130 @@
+# core, email_queue.py:
+# durable outgoing email. the request only INSERTs the message (QueuedEmailBackend),
+# drain_queue() sends due messages in batches over a single reused connection of the delivery backend,
+# failed messages are retried with exponential backoff.
+import base64
+import logging
+from datetime import timedelta
+from email.mime.base import MIMEBase
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+from core.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+CLAIM_LEASE = timedelta(minutes=5)  # a crashed worker's claimed rows become due again after this
+
+
+def _attachment(attachment):
+    if isinstance(attachment, MIMEBase):  # already encoded MIME parts are not stored, send those inline
+        raise ValueError("Queued email cannot hold MIMEBase attachments, send this message with an inline backend")
+    filename, content, mimetype = attachment
+    if isinstance(content, str):
+        return {"filename": filename, "content": content, "mimetype": mimetype, "base64": False}
+    return {"filename": filename, "content": base64.b64encode(content).decode("ascii"), "mimetype": mimetype, "base64": True}
+
+
+def to_row(message):
+    """QueuedEmail (unsaved) holding everything needed to rebuild `message`, ValueError if some of it cannot be stored."""
+    return QueuedEmail(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+        cc=list(message.cc),
+        bcc=list(message.bcc),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+        alternatives=[[content, mimetype] for content, mimetype in getattr(message, "alternatives", [])],
+        attachments=[_attachment(attachment) for attachment in message.attachments],
+        content_subtype=message.content_subtype,
+    )
+
+
+def to_message(row, connection=None):
+    message = EmailMultiAlternatives(
+        subject=row.subject, body=row.body, from_email=row.from_email,
+        to=row.to, cc=row.cc, bcc=row.bcc, reply_to=row.reply_to, headers=row.headers,
+        connection=connection,
+    )
+    message.content_subtype = row.content_subtype
+    for content, mimetype in row.alternatives:
+        message.attach_alternative(content, mimetype)
+    for attachment in row.attachments:
+        content = base64.b64decode(attachment["content"]) if attachment["base64"] else attachment["content"]
+        message.attach(attachment["filename"], content, attachment["mimetype"])
+    return message
+
+
+def get_delivery_connection(backend=None):
+    return get_connection(backend or getattr(settings, "QUEUED_EMAIL_DELIVERY_BACKEND", "django.core.mail.backends.smtp.EmailBackend"))
+
+
+def _backoff(attempts):
+    """1, 2, 4, 8 ... minutes, capped at one day."""
+    return timedelta(minutes=min(2 ** max(attempts - 1, 0), 24 * 60))
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE, max_attempts=5):
+    """Lease a batch of due rows (SKIP LOCKED where supported), short transaction, nothing is sent inside it."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = QueuedEmail.objects.filter(next_attempt_at__lte=now, attempts__lt=max_attempts).order_by("next_attempt_at", "pk")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due[:batch_size])
+        QueuedEmail.objects.filter(pk__in=[row.pk for row in rows]).update(next_attempt_at=now + CLAIM_LEASE)
+    return rows
+
+
+def send_batch(rows, mail_connection):
+    """Send `rows` over the already opened `mail_connection`. Returns (sent, failed)."""
+    sent, failed = [], []
+    for row in rows:
+        try:
+            if mail_connection.send_messages([to_message(row, mail_connection)]):
+                sent.append(row.pk)
+                continue
+            error = "delivery backend reported 0 messages sent"
+        except Exception as exc:
+            logger.warning("Sending queued email %s failed: %s", row.pk, exc)
+            error = repr(exc)[:1000]
+            try:  # the connection may be dead, start a fresh one for the rest of the batch
+                mail_connection.close()
+                mail_connection.open()
+            except Exception:
+                logger.exception("Could not reopen the mail connection")
+        row.attempts += 1
+        row.last_error = error
+        row.next_attempt_at = timezone.now() + _backoff(row.attempts)
+        failed.append(row)
+
+    QueuedEmail.objects.filter(pk__in=sent).delete()
+    QueuedEmail.objects.bulk_update(failed, ["attempts", "last_error", "next_attempt_at"])
+    return len(sent), len(failed)
+
+
+def drain_queue(backend=None, batch_size=DEFAULT_BATCH_SIZE, max_attempts=5, max_batches=None):
+    """Send every due message, all batches over one connection. Returns (sent, failed) totals."""
+    sent = failed = batches = 0
+    mail_connection = get_delivery_connection(backend)
+    try:
+        mail_connection.open()
+    except Exception:  # server unreachable, nothing was claimed, the next run tries again
+        logger.exception("Could not open the mail connection")
+        return 0, 0
+    try:
+        while max_batches is None or batches < max_batches:
+            rows = claim_batch(batch_size, max_attempts)
+            if not rows:
+                break
+            batch_sent, batch_failed = send_batch(rows, mail_connection)
+            sent += batch_sent
+            failed += batch_failed
+            batches += 1
+    finally:
+        mail_connection.close()
+    return sent, failed
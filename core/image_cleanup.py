@@ -0,0 +1,127 @@
+# core, image_cleanup.py:
+# deferred Cloudinary deletes. signals only queue public_ids (a local INSERT once the save/delete has committed,
+# no HTTP call in the request), drain_queue() later removes them with the Admin API bulk delete,
+# up to 100 ids per call, with backoff on failure.
+import logging
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.models import OrphanedImage
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_BULK_LIMIT = 100  # max public_ids per delete_resources call
+DONE_STATES = ("deleted", "not_found")
+CLAIM_LEASE = timedelta(minutes=5)  # a crashed worker's claimed rows become due again after this
+
+
+def public_id_of(value):
+    """public_id of a CloudinaryResource, None for empty values and fresh uploads."""
+    return getattr(value, "public_id", None) if value else None
+
+
+def _record_orphan(public_id):
+    OrphanedImage.objects.bulk_create([OrphanedImage(public_id=public_id)], ignore_conflicts=True)
+
+
+def queue_image_deletion(public_id):
+    """
+    Record an orphaned Cloudinary image once the current transaction commits, duplicates are ignored.
+    A rolled-back save or delete queues nothing, so an image that is still referenced is never deleted.
+    """
+    if public_id:
+        transaction.on_commit(partial(_record_orphan, public_id), robust=True)
+
+
+class CloudinaryClient:
+    """Real client, Cloudinary Admin API bulk delete."""
+
+    def delete_resources(self, public_ids):
+        import cloudinary.api
+        return cloudinary.api.delete_resources(public_ids)
+
+
+class StubCloudinaryClient:
+    """
+    Offline stand-in, records every call and reports all ids deleted.
+    Set `fail` to an exception to simulate an outage, or `not_deleted` to ids that should come back as errors.
+    """
+
+    def __init__(self, fail=None, not_deleted=()):
+        self.calls = []
+        self.fail = fail
+        self.not_deleted = set(not_deleted)
+
+    def delete_resources(self, public_ids):
+        self.calls.append(list(public_ids))
+        if self.fail:
+            raise self.fail
+        return {"deleted": {pid: "error" if pid in self.not_deleted else "deleted" for pid in public_ids}}
+
+
+def get_client():
+    return import_string(getattr(settings, "IMAGE_CLEANUP_CLIENT", "core.image_cleanup.CloudinaryClient"))()
+
+
+def _backoff(attempts):
+    """1, 2, 4, 8 ... minutes, capped at one day."""
+    return timedelta(minutes=min(2 ** max(attempts - 1, 0), 24 * 60))
+
+
+def claim_batch(batch_size=CLOUDINARY_BULK_LIMIT, max_attempts=5):
+    """Lease a batch of due rows (SKIP LOCKED where supported), short transaction, no Cloudinary call inside it."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OrphanedImage.objects.filter(next_attempt_at__lte=now, attempts__lt=max_attempts).order_by("next_attempt_at", "pk")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due[:batch_size])
+        OrphanedImage.objects.filter(pk__in=[row.pk for row in rows]).update(next_attempt_at=now + CLAIM_LEASE)
+    return rows
+
+
+def drain_batch(client, batch_size=CLOUDINARY_BULK_LIMIT, max_attempts=5):
+    """
+    Delete one batch of due images. Returns (deleted, failed).
+    Rows are claimed and committed first, then Cloudinary is called with no lock held,
+    so several workers can drain side by side and a slow API call never blocks the table.
+    """
+    rows = claim_batch(min(batch_size, CLOUDINARY_BULK_LIMIT), max_attempts)
+    if not rows:
+        return 0, 0
+
+    public_ids = [row.public_id for row in rows]
+    try:
+        states = dict(client.delete_resources(public_ids).get("deleted", {}))
+        error = "missing from delete_resources result"
+    except Exception as exc:
+        logger.warning("Cloudinary bulk delete of %d image(s) failed: %s", len(public_ids), exc)
+        states, error = {}, repr(exc)[:1000]
+
+    done = {row.pk for row in rows if states.get(row.public_id) in DONE_STATES}
+    failed = [row for row in rows if row.pk not in done]
+    now = timezone.now()
+    OrphanedImage.objects.filter(pk__in=done).delete()
+    for row in failed:
+        row.attempts += 1
+        row.last_error = f"cloudinary state: {states[row.public_id]}" if row.public_id in states else error
+        row.next_attempt_at = now + _backoff(row.attempts)
+    OrphanedImage.objects.bulk_update(failed, ["attempts", "last_error", "next_attempt_at"])
+    return len(done), len(failed)
+
+
+def drain_queue(client=None, batch_size=CLOUDINARY_BULK_LIMIT, max_attempts=5, max_batches=None):
+    """Drain every due row, batch by batch. Returns (deleted, failed) totals."""
+    client = client or get_client()
+    deleted = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        batch_deleted, batch_failed = drain_batch(client, batch_size, max_attempts)
+        if not batch_deleted and not batch_failed:
+            break
+        deleted += batch_deleted
+        failed += batch_failed
+        batches += 1
+    return deleted, failed
@@ -0,0 +1,71 @@
+# core/management/commands/benchmark_db_connections.py
+# run from project root: python manage.py benchmark_db_connections [--requests 200] [--database default]
+# what a request pays for its database connection under each DB_CONNECTION_MODE (core/db_connections.py),
+# measured against the configured database (point it at Supabase to see the TLS handshake cost).
+# each simulated request runs Django's request_started / request_finished connection housekeeping around one
+# SELECT 1, on private connections built from the alias' settings; the app's own connections are not touched.
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from core.db_connections import pool_available
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request connect cost with reused, health-checked and pooled connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        base = connections[options['database']].settings_dict
+        modes = [
+            ('per_request', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+            ('persistent', {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': False}),
+            ('persistent + health checks', {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True}),
+        ]
+        if base['ENGINE'].endswith('postgresql') and pool_available():
+            pool_options = {**base.get('OPTIONS', {}), 'pool': {'min_size': 1, 'max_size': 1}}
+            modes.append(('pool', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': pool_options}))
+        else:
+            self.stdout.write("pool: skipped, needs PostgreSQL with psycopg[pool] installed")
+
+        results = {}
+        for label, overrides in modes:
+            try:
+                timings = self.run_requests(options['database'], {**base, **overrides}, options['requests'])
+            except DatabaseError as e:
+                raise CommandError(f"{label}: cannot reach database {options['database']!r}: {e}")
+            results[label] = timings
+            ordered = sorted(timings)
+            self.stdout.write(
+                f"{label:<28} first {timings[0] * 1000:8.2f} ms   mean {statistics.fmean(timings) * 1000:8.2f} ms   "
+                f"p50 {ordered[len(ordered) // 2] * 1000:8.2f} ms   p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:8.2f} ms"
+            )
+
+        saved = statistics.fmean(results['per_request']) - statistics.fmean(results['persistent'])
+        self.stdout.write(self.style.SUCCESS(
+            f"connecting costs {saved * 1000:.2f} ms per request on {base['ENGINE'].rsplit('.', 1)[-1]} "
+            f"({saved * options['requests']:.2f}s over {options['requests']} requests)"
+        ))
+
+    def run_requests(self, alias, settings_dict, count):
+        wrapper_class = type(connections[alias])
+        # own alias so a pool is not shared with the app's (Django keys pools by alias)
+        connection = wrapper_class(settings_dict, alias=f"benchmark-{alias}")
+        timings = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                connection.close_if_unusable_or_obsolete()  # request_started
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                connection.close_if_unusable_or_obsolete()  # request_finished
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+            if settings_dict.get('OPTIONS', {}).get('pool'):
+                connection.close_pool()
+        return timings
@@ -0,0 +1,46 @@
+# core/management/commands/benchmark_email_queue.py
+# run from project root: python manage.py benchmark_email_queue [--messages 1000] [--backend ...]
+# measures enqueue rate (what a signup request pays) and drain throughput of the worker.
+# everything runs inside a transaction that is rolled back, the queue is left untouched.
+import time
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.email_queue import DEFAULT_BATCH_SIZE, drain_queue
+from users.email_backends import QueuedEmailBackend
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the queued email backend and the batch sender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--backend', default='django.core.mail.backends.locmem.EmailBackend',
+                            help='Delivery backend used by the drain, locmem by default (no network)')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        messages = [
+            mail.EmailMultiAlternatives(f"Activate your account #{i}", "Click the link.", "noreply@blog-ink.local", [f"user{i}@example.com"])
+            for i in range(count)
+        ]
+        for message in messages:
+            message.attach_alternative("<p>Click the link.</p>", "text/html")
+
+        with transaction.atomic():
+            backend = QueuedEmailBackend()
+            started = time.perf_counter()
+            for message in messages:  # one call per message, like one signup per request
+                backend.send_messages([message])
+            enqueue_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            sent, failed = drain_queue(options['backend'], options['batch_size'])
+            drain_seconds = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"enqueue: {count} messages in {enqueue_seconds:.3f}s "
+                          f"({count / enqueue_seconds:.0f} msg/s, {enqueue_seconds / count * 1000:.2f} ms per request)")
+        self.stdout.write(f"drain:   {sent} sent, {failed} failed in {drain_seconds:.3f}s "
+                          f"({sent / drain_seconds:.0f} msg/s, batch size {options['batch_size']}, backend {options['backend']})")
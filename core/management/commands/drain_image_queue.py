@@ -0,0 +1,28 @@
+# core/management/commands/drain_image_queue.py
+# run from project root: python manage.py drain_image_queue [--loop --interval 60] [--stub]
+# deletes queued orphaned Cloudinary images in bulk (see core/image_cleanup.py)
+import time
+from django.core.management.base import BaseCommand
+from core.image_cleanup import CLOUDINARY_BULK_LIMIT, StubCloudinaryClient, drain_queue, get_client
+from core.models import OrphanedImage
+
+
+class Command(BaseCommand):
+    help = 'Delete queued orphaned Cloudinary images with the bulk delete API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CLOUDINARY_BULK_LIMIT, help='Ids per API call (max 100)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Give up on an id after this many failures')
+        parser.add_argument('--loop', action='store_true', help='Keep running as a worker')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between runs with --loop')
+        parser.add_argument('--stub', action='store_true', help='Use the offline stub client, no Cloudinary calls')
+
+    def handle(self, *args, **options):
+        client = StubCloudinaryClient() if options['stub'] else get_client()
+        while True:
+            deleted, failed = drain_queue(client, options['batch_size'], options['max_attempts'])
+            pending = OrphanedImage.objects.count()
+            self.stdout.write(f"deleted {deleted}, failed {failed}, {pending} still queued")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
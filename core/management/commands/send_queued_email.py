@@ -0,0 +1,28 @@
+# core/management/commands/send_queued_email.py
+# run from project root: python manage.py send_queued_email [--loop --interval 10]
+# delivers queued email in batches over one reused connection (see core/email_queue.py)
+import time
+from django.core.management.base import BaseCommand
+from core.email_queue import DEFAULT_BATCH_SIZE, drain_queue
+from core.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = 'Send queued email in batches with retry and backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=5, help='Give up on a message after this many failures')
+        parser.add_argument('--backend', help='Delivery backend, defaults to QUEUED_EMAIL_DELIVERY_BACKEND')
+        parser.add_argument('--loop', action='store_true', help='Keep running as a worker')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_queue(options['backend'], options['batch_size'], options['max_attempts'])
+            if sent or failed or not options['loop']:
+                pending = QueuedEmail.objects.count()
+                self.stdout.write(f"sent {sent}, failed {failed}, {pending} still queued")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
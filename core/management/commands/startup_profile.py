@@ -0,0 +1,97 @@
+# core/management/commands/startup_profile.py
+# run from project root: python manage.py startup_profile [--runs 3] [--top 20] [--json]
+# cold-start cost of the WSGI app (what a Vercel cold start pays before the first byte), measured in fresh interpreters:
+#   - app ready: importing settings.WSGI_APPLICATION's module (settings, django.setup(), every app's models / signals)
+#   - urlconf: loading ROOT_URLCONF, every view module, what the first request adds on top
+#   - import time per top-level package and the slowest single modules, from one `python -X importtime` run
+#   - which drf_yasg modules a cold start still loads: only the schema view is lazy (core/urls.py), the views'
+#     @swagger_auto_schema imports drf_yasg.utils / openapi with them
+# --json prints one JSON object instead, append it to a log to track cold starts over time.
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+WATCHED = ('drf_yasg',)  # packages deferred only in part, their modules loaded at cold start are listed
+
+CHILD = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+ready = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({"app_ready": ready - started, "urlconf": time.perf_counter() - ready}))
+"""
+
+
+def parse_importtime(stderr):
+    """(self µs, cumulative µs, module) for every line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        rows.append((int(own), int(cumulative), name.strip()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import time and app-ready time of a cold WSGI start'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to time, the median is reported')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='One JSON object, for tracking over time')
+
+    def handle(self, *args, **options):
+        module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+
+        runs = [json.loads(self.run_child(module, env).stdout) for _ in range(options['runs'])]
+        app_ready = statistics.median(r['app_ready'] for r in runs)
+        urlconf = statistics.median(r['urlconf'] for r in runs)
+
+        rows = parse_importtime(self.run_child(module, env, importtime=True).stderr)  # slower, breakdown only
+        packages = Counter()
+        for own, _, name in rows:
+            packages[name.split('.')[0]] += own
+        slowest = sorted(rows, key=lambda row: -row[0])[:options['top']]
+        watched = {package: sorted(name for _, _, name in rows if name.split('.')[0] == package) for package in WATCHED}
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'at': timezone.now().isoformat(), 'wsgi': module, 'runs': options['runs'],
+                'app_ready_ms': round(app_ready * 1000, 1), 'urlconf_ms': round(urlconf * 1000, 1),
+                'modules': len(rows),
+                'packages_ms': {name: round(us / 1000, 1) for name, us in packages.most_common(options['top'])},
+                'watched': watched,
+            }))
+            return
+
+        self.stdout.write(f"import time per package (self time summed, {len(rows)} modules, -X importtime inflates it):")
+        for name, us in packages.most_common(options['top']):
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {name}")
+        self.stdout.write("slowest modules (self time):")
+        for own, cumulative, name in slowest:
+            self.stdout.write(f"  {own / 1000:8.1f} ms  {name}  (with imports {cumulative / 1000:.1f} ms)")
+        for package, names in watched.items():
+            self.stdout.write(f"{package} at cold start: {', '.join(names) if names else 'not loaded'}")
+        if env.get('PYTHONDONTWRITEBYTECODE') or sys.dont_write_bytecode:
+            self.stdout.write("bytecode cache off: project modules are compiled on every start (like on a read-only filesystem)")
+        self.stdout.write(self.style.SUCCESS(
+            f"app ready {app_ready * 1000:.0f} ms, urlconf {urlconf * 1000:.0f} ms, "
+            f"cold start {(app_ready + urlconf) * 1000:.0f} ms (median of {options['runs']})"
+        ))
+
+    def run_child(self, module, env, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD, module]
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"starting {module} failed:\n{result.stderr[-2000:]}")
+        return result
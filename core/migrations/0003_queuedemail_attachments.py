@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_queuedemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedemail',
+            name='attachments',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='queuedemail',
+            name='content_subtype',
+            field=models.CharField(default='plain', max_length=20),
+        ),
+    ]
@@ -1,3 +1,55 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OrphanedImage(models.Model):
+    """
+    Outbox of Cloudinary images that are no longer referenced (post/user deleted or image replaced).
+    Rows are written by the blogs/users signals once the save or delete has committed (transaction.on_commit),
+    and drained in bulk by `python manage.py drain_image_queue` (see core/image_cleanup.py).
+    """
+    public_id = models.CharField(max_length=255, unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["next_attempt_at"]
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="orphanedimage_next_idx"), # drain picks due rows
+        ]
+
+    def __str__(self):
+        return self.public_id
+
+
+class QueuedEmail(models.Model):
+    """
+    Outbox of outgoing email. users.email_backends.QueuedEmailBackend writes rows here and returns at once,
+    `python manage.py send_queued_email` sends them in batches over one SMTP connection (see core/email_queue.py).
+    """
+    subject = models.CharField(max_length=998)
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list)
+    headers = models.JSONField(default=dict)
+    alternatives = models.JSONField(default=list) # [[content, mimetype], ...] e.g. the html part
+    attachments = models.JSONField(default=list) # [{"filename", "content", "mimetype", "base64"}, ...], bytes content base64 encoded
+    content_subtype = models.CharField(max_length=20, default="plain") # "html" for a body that is html
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["next_attempt_at"]
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="queuedemail_next_idx"), # worker picks due rows
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
@@ -0,0 +1,161 @@
+# core, query_budget.py:
+# counts the SQL queries of every request, spots N+1 patterns (the same SQL shape run again and again)
+# and logs a warning when a view goes over its query budget. worst endpoints are kept for a summary report.
+#
+# settings.QUERY_BUDGET = {
+#     'ENABLED': DEBUG,             # off in production unless asked for, every query goes through a wrapper
+#     'DEFAULT': 30,                # queries per request, unless the view sets `query_budget`
+#     'N_PLUS_ONE_THRESHOLD': 5,    # same SQL shape this many times in one request = N+1
+#     'RAISE': False,               # raise QueryBudgetExceeded instead of logging, for tests only: the view has
+#                                   # already run (and committed) by then, the client would get a 500 for it
+# }
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"DEFAULT": 30, "N_PLUS_ONE_THRESHOLD": 5, "RAISE": False}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_config():
+    return {"ENABLED": settings.DEBUG, **DEFAULTS, **getattr(settings, "QUERY_BUDGET", {})}
+
+
+class QueryRecorder:
+    """Context manager, records every query sent through any configured database connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[sql] += 1  # sql still has %s placeholders, so it is the shape of the query
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.shapes.most_common() if n >= threshold]
+
+
+class QueryReport:
+    """Per-endpoint totals, kept in process memory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, endpoint, recorder, over_budget, repeated):
+        with self._lock:
+            row = self._endpoints.setdefault(endpoint, {
+                "endpoint": endpoint, "requests": 0, "total_queries": 0, "max_queries": 0,
+                "over_budget": 0, "n_plus_one": 0, "worst_repeated_sql": "",
+            })
+            row["requests"] += 1
+            row["total_queries"] += recorder.count
+            row["max_queries"] = max(row["max_queries"], recorder.count)
+            row["over_budget"] += int(over_budget)
+            if repeated:
+                row["n_plus_one"] += 1
+                row["worst_repeated_sql"] = repeated[0][0][:300]
+
+    def summary(self, limit=20):
+        """Worst endpoints first, by average queries per request."""
+        with self._lock:
+            rows = [dict(row) for row in self._endpoints.values()]
+        for row in rows:
+            row["avg_queries"] = round(row["total_queries"] / row["requests"], 2)
+        return sorted(rows, key=lambda row: (row["avg_queries"], row["max_queries"]), reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+report = QueryReport()
+
+
+def _endpoint(request):
+    match = getattr(request, "resolver_match", None)
+    return f"{request.method} /{match.route}" if match else f"{request.method} {request.path}"
+
+
+def _view_budget(request, config):
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(getattr(match, "func", None), "cls", None)
+    budget = getattr(view_class, "query_budget", None)
+    return config["DEFAULT"] if budget is None else budget
+
+
+def check_budget(request, recorder, budget, config):
+    """Record the request in the report, then log a warning if it went over budget or showed an N+1."""
+    endpoint = _endpoint(request)
+    repeated = recorder.repeated(config["N_PLUS_ONE_THRESHOLD"])
+    over_budget = recorder.count > budget
+    report.add(endpoint, recorder, over_budget, repeated)
+    if not over_budget and not repeated:
+        return
+
+    message = f"{endpoint} ran {recorder.count} queries (budget {budget})"
+    if repeated:
+        sql, times = repeated[0]
+        message += f", possible N+1: {times}x {sql[:200]}"
+    if config["RAISE"]:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryBudgetMiddleware:
+    """Counts queries per request, add after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        with QueryRecorder() as recorder:
+            request._query_recorder = recorder
+            response = self.get_response(request)
+        if settings.DEBUG:
+            response["X-Query-Count"] = str(recorder.count)
+        check_budget(request, recorder, _view_budget(request, config), config)
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    DRF view mixin, `query_budget` overrides QUERY_BUDGET['DEFAULT'] for this view.
+    Enforces the budget itself when QueryBudgetMiddleware is not installed.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        config = get_config()
+        if not config["ENABLED"] or hasattr(request, "_query_recorder"):  # middleware already counts
+            return super().dispatch(request, *args, **kwargs)
+
+        with QueryRecorder() as recorder:
+            request._query_recorder = recorder
+            response = super().dispatch(request, *args, **kwargs)
+        budget = config["DEFAULT"] if self.query_budget is None else self.query_budget
+        check_budget(request, recorder, budget, config)
+        return response
@@ -0,0 +1,138 @@
+# core, response_cache.py:
+# server-side cache for public list endpoints.
+# - stores the serialized `response.data` per (namespace, path + query params, audience tier)
+# - invalidation is by versioned namespace: writes bump the namespace version, old keys are never read again
+#   and simply expire, so no key scanning is needed (works on any Django cache backend)
+# - backend is the CACHES[RESPONSE_CACHE_ALIAS] entry. off unless RESPONSE_CACHE_ENABLED, and never used with a
+#   per-process backend (locmem, dummy): a write handled by one worker bumps the version in that worker's memory only,
+#   the others would keep serving the old pages until they expire
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+from core.conditional import conditional_response
+
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+NAMESPACE_POSTS = "posts"
+NAMESPACE_CATEGORIES = "categories"
+
+STAT_NAMES = ("hits", "misses", "invalidations")
+PER_PROCESS_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache")
+
+
+def is_enabled():
+    """RESPONSE_CACHE_ENABLED is set and the backend is shared by every worker."""
+    if not getattr(settings, "RESPONSE_CACHE_ENABLED", False):
+        return False
+    backend = settings.CACHES[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]["BACKEND"]
+    return backend not in PER_PROCESS_BACKENDS
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:  # missing or evicted
+        cache.set(key, 1, None)
+        return 1
+
+
+def _record(stat):
+    _incr(get_cache(), f"respcache:stats:{stat}")
+
+
+def namespace_version(namespace):
+    """Current version of `namespace`, seeded with a timestamp so an evicted counter never reuses old keys."""
+    cache = get_cache()
+    key = f"respcache:ns:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(*namespaces):
+    """Bump the version of each namespace, making every cached response under it unreachable."""
+    if not is_enabled():
+        return
+    cache = get_cache()
+    for namespace in namespaces:
+        key = f"respcache:ns:{namespace}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        _record("invalidations")
+
+
+def audience_tier(user):
+    """Users in the same tier see the same public list responses."""
+    if not user or not user.is_authenticated:
+        return "anon"
+    if user.is_staff:
+        return "staff"
+    if getattr(user, "is_subscribed", False):
+        return "subscriber"
+    return "member"
+
+
+def build_key(namespace, request):
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.lists()))
+    renderer = getattr(getattr(request, "accepted_renderer", None), "format", "")
+    digest = hashlib.md5(f"{request.path}?{query}|{renderer}".encode(), usedforsecurity=False).hexdigest()
+    return f"respcache:{namespace}:v{namespace_version(namespace)}:{audience_tier(request.user)}:{digest}"
+
+
+def cache_response(namespace, timeout=None, anonymous_only=False):
+    """
+    Cache a GET view method's 200 response data under `namespace`.
+    `anonymous_only` for responses personalised per user (e.g. is_liked_by_me), signed-in users bypass the cache.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != "GET" or getattr(self, "swagger_fake_view", False) or not is_enabled():
+                return view_method(self, request, *args, **kwargs)
+            if anonymous_only and request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            key = build_key(namespace, request)
+            cached = cache.get(key)
+            if cached is not None:
+                _record("hits")
+                data, headers = cached
+                if "ETag" in headers:  # conditional GET straight from the cache
+                    last_modified = parse_http_date_safe(headers.get("Last-Modified", ""))
+                    not_modified = conditional_response(request, headers["ETag"], last_modified)
+                    if not_modified is not None:
+                        return not_modified
+                return Response(data, headers=headers)
+
+            _record("misses")
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                headers = {h: response[h] for h in VALIDATOR_HEADERS if response.has_header(h)}
+                cache.set(key, (response.data, headers), timeout if timeout is not None else getattr(settings, "RESPONSE_CACHE_TIMEOUT", 60))
+            return response
+        return wrapper
+    return decorator
+
+
+def get_stats():
+    if not is_enabled():
+        return {"enabled": False}
+    cache = get_cache()
+    stats = {"enabled": True, **{name: cache.get(f"respcache:stats:{name}", 0) for name in STAT_NAMES}}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["namespaces"] = {ns: namespace_version(ns) for ns in (NAMESPACE_POSTS, NAMESPACE_CATEGORIES)}
+    return stats
@@ -0,0 +1,50 @@
+# core, sparse_fields.py:
+# ?fields=a,b  -> only these serializer fields      ?omit=a,b -> everything but these
+# the serializer drops the fields, the viewset defers the model columns nobody reads any more,
+# so e.g. ?omit=body never loads post bodies from the database. writes always use the full serializer.
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _param_set(request, name):
+    raw = request.query_params.get(name, "")
+    return {part.strip() for part in raw.split(",") if part.strip()}
+
+
+def requested_fields(request):
+    """(fields, omit) from the query string, fields is None when not restricted."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    return _param_set(request, "fields") or None, _param_set(request, "omit")
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer mixin, trims `self.fields` to ?fields= / ?omit= on read requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit = requested_fields(self.context.get("request"))
+        for name in list(self.fields):
+            if (fields is not None and name not in fields and name != "id") or name in omit:
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """
+    GenericViewSet mixin, defers the concrete model columns that no remaining serializer field reads.
+    `always_load_fields`: columns needed outside the serializer (ordering, ETags ...).
+    Relations are never deferred, they may be traversed by select_related.
+    """
+    always_load_fields = ()
+
+    def defer_unused_fields(self, queryset):
+        fields, omit = requested_fields(self.request)
+        if fields is None and not omit:
+            return queryset
+        serializer = self.get_serializer()
+        sources = {field.source.split(".")[0] for field in serializer.fields.values()}
+        unused = [
+            field.name for field in queryset.model._meta.concrete_fields
+            if not field.is_relation and not field.primary_key
+            and field.name not in sources and field.name not in self.always_load_fields
+        ]
+        return queryset.defer(*unused)
@@ -1,3 +1,342 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from email.mime.text import MIMEText
+from smtplib import SMTPException
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives, send_mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from categories.models import Category
+from .db_connections import configure_connections, pool_available
+from .db_router import PIN_COOKIE, PrimaryReplicaRouter, ReplicaHealth, ReplicaRoutingMiddleware, health, pin_cache
+from .email_queue import drain_queue
+from .export import iter_rows, stream_export
+from .image_cleanup import CLAIM_LEASE, StubCloudinaryClient, drain_queue as drain_image_queue, queue_image_deletion
+from .models import OrphanedImage, QueuedEmail
+from .query_budget import QueryBudgetExceeded, QueryBudgetMiddleware, QueryBudgetMixin, report as query_report
 
-# Create your tests here.
+LOCMEM_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only, the replica alias is never connected to (its lag check is patched out)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        pin_cache().clear()
+        patcher = mock.patch.object(health, "healthy", side_effect=lambda aliases: list(aliases))
+        self.healthy = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_request(self, request, write=False):
+        """Pass `request` through the middleware, return the read aliases the view saw and the response."""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(None))
+            if write:
+                self.router.db_for_write(None)
+                reads.append(self.router.db_for_read(None))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return reads, response
+
+    def test_safe_request_reads_from_replica(self):
+        reads, response = self.run_request(self.factory.get("/api/v1/posts/"))
+        self.assertEqual(reads, ["replica1"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_outside_a_request_reads_from_primary(self):
+        self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+    def test_write_request_pins_the_client_to_primary(self):
+        auth = {"HTTP_AUTHORIZATION": "Bearer token-a"}
+        reads, response = self.run_request(self.factory.post("/api/v1/posts/", **auth), write=True)
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        reads, _ = self.run_request(self.factory.get("/api/v1/posts/", **auth))
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])  # reads its own write
+        reads, _ = self.run_request(self.factory.get("/api/v1/posts/", HTTP_AUTHORIZATION="Bearer token-b"))
+        self.assertEqual(reads, ["replica1"])  # other clients are not pinned
+
+    def test_write_during_safe_request_moves_remaining_reads_to_primary(self):
+        reads, response = self.run_request(self.factory.get("/api/v1/posts/"), write=True)
+        self.assertEqual(reads, ["replica1", DEFAULT_DB_ALIAS])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pin_cookie_keeps_browser_on_primary(self):
+        request = self.factory.get("/api/v1/posts/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        reads, _ = self.run_request(request)
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+
+    def test_no_healthy_replica_falls_back_to_primary(self):
+        self.healthy.side_effect = lambda aliases: []
+        reads, _ = self.run_request(self.factory.get("/api/v1/posts/"))
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=2, REPLICA_LAG_CHECK_SECONDS=0)
+    def test_lagging_replica_is_skipped_until_it_catches_up(self):
+        checker = ReplicaHealth()
+        with mock.patch.object(checker, "lag", return_value=30.0):
+            self.assertEqual(checker.healthy(["replica1"]), [])
+        with mock.patch.object(checker, "lag", return_value=0.5):
+            self.assertEqual(checker.healthy(["replica1"]), ["replica1"])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate("replica1", "blogs"), False)
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, "blogs"))
+
+
+@override_settings(EMAIL_BACKEND="users.email_backends.QueuedEmailBackend", QUEUED_EMAIL_DELIVERY_BACKEND=LOCMEM_BACKEND)
+class EmailQueueTests(TestCase):
+    """QueuedEmailBackend stores, drain_queue() delivers through the locmem backend (mail.outbox)."""
+
+    def test_send_mail_only_queues(self):
+        send_mail("Activate", "body", "noreply@example.com", ["a@example.com"])
+        self.assertEqual(mail.outbox, [])
+        row = QueuedEmail.objects.get()
+        self.assertEqual((row.subject, row.to, row.attempts), ("Activate", ["a@example.com"], 0))
+
+    def test_drain_rebuilds_the_message_and_empties_the_queue(self):
+        message = EmailMultiAlternatives("Reset", "<p>plain?</p>", "noreply@example.com", ["a@example.com"], cc=["c@example.com"])
+        message.content_subtype = "html"
+        message.attach_alternative("<b>html</b>", "text/html")
+        message.attach("notes.txt", "text attachment", "text/plain")
+        message.attach("logo.png", b"\x89PNG\x00\xff", "image/png")
+        message.send()
+
+        self.assertEqual(drain_queue(), (1, 0))
+        self.assertFalse(QueuedEmail.objects.exists())
+        sent = mail.outbox[0]
+        self.assertEqual((sent.subject, sent.to, sent.cc, sent.content_subtype), ("Reset", ["a@example.com"], ["c@example.com"], "html"))
+        self.assertEqual([tuple(a) for a in sent.alternatives], [("<b>html</b>", "text/html")])
+        self.assertEqual([tuple(a) for a in sent.attachments], [
+            ("notes.txt", "text attachment", "text/plain"),
+            ("logo.png", b"\x89PNG\x00\xff", "image/png"),
+        ])
+
+    def test_mime_attachment_is_refused(self):
+        message = EmailMessage("Report", "body", "noreply@example.com", ["a@example.com"])
+        message.attach(MIMEText("already encoded"))
+        with self.assertRaises(ValueError):
+            message.send()
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        send_mail("Activate", "body", "noreply@example.com", ["a@example.com"])
+        with mock.patch.object(LocmemBackend, "send_messages", side_effect=SMTPException("421 try later")), \
+                self.assertLogs("core.email_queue", "WARNING"):
+            self.assertEqual(drain_queue(), (0, 1))
+        row = QueuedEmail.objects.get()
+        self.assertEqual(row.attempts, 1)
+        self.assertIn("421 try later", row.last_error)
+        self.assertGreater(row.next_attempt_at, timezone.now())
+
+        self.assertEqual(drain_queue(), (0, 0))  # not due yet
+        QueuedEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_queue(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_message_is_given_up_after_max_attempts(self):
+        send_mail("Activate", "body", "noreply@example.com", ["a@example.com"])
+        QueuedEmail.objects.update(attempts=5)
+        self.assertEqual(drain_queue(max_attempts=5), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertTrue(QueuedEmail.objects.exists())  # kept for the admin to inspect
+
+
+class ImageCleanupQueueTests(TestCase):
+    """Offline, core.image_cleanup.StubCloudinaryClient stands in for the Admin API."""
+
+    def queue(self, *public_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            for public_id in public_ids:
+                queue_image_deletion(public_id)
+
+    def test_queued_on_commit_only(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            queue_image_deletion("blog/a")
+        self.assertFalse(OrphanedImage.objects.exists())  # rolled back here: nothing queued
+        self.assertEqual(len(callbacks), 1)
+        self.queue("blog/a", "blog/a")
+        self.assertEqual(list(OrphanedImage.objects.values_list("public_id", flat=True)), ["blog/a"])
+
+    def test_drain_deletes_in_bulk(self):
+        self.queue("blog/a", "blog/b", "blog/c")
+        client = StubCloudinaryClient()
+        self.assertEqual(drain_image_queue(client, batch_size=2), (3, 0))
+        self.assertEqual(sorted(map(len, client.calls)), [1, 2])
+        self.assertFalse(OrphanedImage.objects.exists())
+
+    def test_lease_is_committed_before_cloudinary_is_called(self):
+        self.queue("blog/a")
+        seen = []
+
+        class ObservingClient(StubCloudinaryClient):
+            def delete_resources(self, public_ids):
+                seen.append(OrphanedImage.objects.get(public_id="blog/a").next_attempt_at)
+                return super().delete_resources(public_ids)
+
+        before = timezone.now()
+        drain_image_queue(ObservingClient())
+        self.assertGreaterEqual(seen[0], before + CLAIM_LEASE)  # another worker skips the row while the call runs
+
+    def test_outage_and_error_states_back_off(self):
+        self.queue("blog/a", "blog/b")
+        with self.assertLogs("core.image_cleanup", "WARNING"):
+            self.assertEqual(drain_image_queue(StubCloudinaryClient(fail=ConnectionError("down"))), (0, 2))
+        self.assertEqual(set(OrphanedImage.objects.values_list("attempts", flat=True)), {1})
+        self.assertEqual(drain_image_queue(StubCloudinaryClient()), (0, 0))  # backing off
+
+        OrphanedImage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_image_queue(StubCloudinaryClient(not_deleted=["blog/b"])), (1, 1))
+        row = OrphanedImage.objects.get()
+        self.assertEqual((row.public_id, row.attempts, row.last_error), ("blog/b", 2, "cloudinary state: error"))
+
+
+def run_lookups(count):
+    """`count` queries of the same shape, an N+1 pattern."""
+    for pk in range(count):
+        get_user_model().objects.filter(pk=pk).exists()
+
+
+class BudgetedView(QueryBudgetMixin, APIView):
+    authentication_classes = []
+    permission_classes = []
+    query_budget = 3
+
+    def get(self, request):
+        run_lookups(int(request.query_params.get("n", 0)))
+        return Response({"ok": True})
+
+
+BUDGET = {"ENABLED": True, "DEFAULT": 4, "N_PLUS_ONE_THRESHOLD": 3, "RAISE": False}
+
+
+@override_settings(QUERY_BUDGET=BUDGET)
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        query_report.reset()
+
+    def middleware_response(self, count):
+        def view(request):
+            run_lookups(count)
+            return HttpResponse("ok")
+        return QueryBudgetMiddleware(view)(self.factory.get("/api/v1/posts/"))
+
+    def test_within_budget_is_quiet(self):
+        with self.assertNoLogs("core.query_budget"):
+            self.assertEqual(self.middleware_response(2).status_code, 200)
+        self.assertEqual(query_report.summary()[0]["max_queries"], 2)
+
+    def test_over_budget_logs_and_still_responds(self):
+        with self.assertLogs("core.query_budget", "WARNING") as logs:
+            response = self.middleware_response(6)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ran 6 queries (budget 4), possible N+1: 6x", logs.output[0])
+        row = query_report.summary()[0]
+        self.assertEqual((row["over_budget"], row["n_plus_one"]), (1, 1))
+
+    @override_settings(QUERY_BUDGET={**BUDGET, "RAISE": True})
+    def test_raise_is_opt_in(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.middleware_response(6)
+
+    @override_settings(QUERY_BUDGET={}, DEBUG=False)
+    def test_off_by_default_outside_debug(self):
+        with self.assertNoLogs("core.query_budget"):
+            self.middleware_response(50)
+        self.assertEqual(query_report.summary(), [])
+
+    def test_mixin_applies_the_view_budget_without_the_middleware(self):
+        view = BudgetedView.as_view()
+        with self.assertNoLogs("core.query_budget"):
+            view(self.factory.get("/budgeted/", {"n": 2}))
+        with self.assertLogs("core.query_budget", "WARNING") as logs:
+            response = view(self.factory.get("/budgeted/", {"n": 4}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("(budget 3)", logs.output[0])
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.bulk_create([Category(name=f"Category {n}") for n in range(5)])
+
+    def test_rows_come_in_pk_order(self):
+        rows = list(iter_rows(Category.objects.all(), ["id", "name"]))
+        self.assertEqual([row["name"] for row in rows], [f"Category {n}" for n in range(5)])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_pk_ranges_behind_a_transaction_pooler(self):
+        with mock.patch.dict(connections[DEFAULT_DB_ALIAS].settings_dict, {"DISABLE_SERVER_SIDE_CURSORS": True}):
+            with self.assertNumQueries(3):  # 2 + 2 + 1 rows
+                rows = list(iter_rows(Category.objects.filter(name__startswith="Category"), ["id", "name"]))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(len({row["id"] for row in rows}), 5)
+
+    def test_csv_and_ndjson_stream(self):
+        queryset = Category.objects.filter(name__in=["Category 0", "Category 1"])
+        response = stream_export(queryset, ["id", "name"], "csv", "categories")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertRegex(response["Content-Disposition"], r'^attachment; filename="categories-\d{8}-\d{6}\.csv"$')
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([line.split(",", 1)[1] for line in lines], ["name", "Category 0", "Category 1"])
+
+        response = stream_export(queryset, ["id", "name", "created_at"], "ndjson", "categories")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Category 0", "Category 1"])
+        self.assertIsInstance(rows[0]["created_at"], str)
+
+
+class ConfigureConnectionsTests(SimpleTestCase):
+    POSTGRES = {"ENGINE": "django.db.backends.postgresql", "NAME": "blog", "OPTIONS": {"sslmode": "require"}}
+
+    def test_modes(self):
+        per_request = configure_connections(self.POSTGRES, "per_request")
+        self.assertEqual((per_request["CONN_MAX_AGE"], per_request["CONN_HEALTH_CHECKS"]), (0, False))
+        persistent = configure_connections(self.POSTGRES, "persistent", max_age=300)
+        self.assertEqual((persistent["CONN_MAX_AGE"], persistent["CONN_HEALTH_CHECKS"]), (300, True))
+        self.assertEqual(self.POSTGRES, {"ENGINE": "django.db.backends.postgresql", "NAME": "blog", "OPTIONS": {"sslmode": "require"}})
+
+    def test_unknown_mode_is_refused(self):
+        with self.assertRaises(ValueError):
+            configure_connections(self.POSTGRES, "forever")
+
+    def test_other_engines_are_left_alone(self):
+        sqlite = {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3"}
+        self.assertEqual(configure_connections(sqlite, "pool", transaction_pooler=True), {**sqlite, "OPTIONS": {}})
+
+    def test_pool_without_psycopg_pool_falls_back_to_persistent(self):
+        with mock.patch("core.db_connections.pool_available", return_value=False):
+            with self.assertWarns(RuntimeWarning):
+                database = configure_connections(self.POSTGRES, "pool", max_age=60)
+        self.assertEqual((database["CONN_MAX_AGE"], database["CONN_HEALTH_CHECKS"]), (60, True))
+        self.assertNotIn("pool", database["OPTIONS"])
+
+    @skipUnless(pool_available(), "needs psycopg[pool]")
+    def test_pool(self):
+        database = configure_connections(self.POSTGRES, "pool", pool_options={"max_size": 8})
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual((database["OPTIONS"]["pool"]["min_size"], database["OPTIONS"]["pool"]["max_size"]), (1, 8))
+
+    def test_transaction_pooler_drops_session_state(self):
+        with mock.patch("core.db_connections.psycopg3_available", return_value=True):
+            database = configure_connections(self.POSTGRES, "persistent", transaction_pooler=True)
+        self.assertTrue(database["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertEqual(database["OPTIONS"], {"sslmode": "require", "prepare_threshold": None})
@@ -0,0 +1,40 @@
+# core, tracking.py:
+# remembers the values some fields had when the instance was loaded from the db,
+# so pre_save signals can see what changed without a second SELECT.
+
+NOT_LOADED = object()  # field was deferred or the instance was never loaded from the db
+
+
+class TrackedFieldsMixin:
+    """
+    Model mixin, put it before the Django model base:  class BlogPost(TrackedFieldsMixin, models.Model)
+    - `tracked_fields`: attnames to snapshot in from_db() and again after every save() / refresh_from_db()
+    - `get_loaded_value(name)`: value as last loaded/saved, or NOT_LOADED
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.tracked_fields
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        for name in self.tracked_fields:
+            if (update_fields is None or name in update_fields) and name in self.__dict__:
+                loaded[name] = self.__dict__[name]
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        for name in self.tracked_fields:
+            if (fields is None or name in fields) and name in self.__dict__:
+                loaded[name] = self.__dict__[name]
+
+    def get_loaded_value(self, name):
+        return self.__dict__.get("_loaded_values", {}).get(name, NOT_LOADED)
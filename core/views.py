@@ -49,3 +49,29 @@ def payment_cancel_redirect(request):
     if request.method == "POST":
         return payment_views.payment_cancel(request)
     return HttpResponseRedirect(_api_path("cancel"))
+
+
+# response cache stats (staff only)
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from core.response_cache import get_stats
+from core.query_budget import report as query_report
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """
+    GET /api/v1/cache/stats/ - hit, miss and invalidation counters of the public list response cache.
+    """
+    return Response(get_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def query_budget_report(request):
+    """
+    GET /api/v1/queries/report/ - endpoints with the most SQL queries per request (this process only).
+    """
+    return Response(query_report.summary())
@@ -1,6 +1,6 @@
 # payment/admin.py
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, Subscription
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -16,4 +16,13 @@ class PaymentAdmin(admin.ModelAdmin):
         ('Timestamps', {
             'fields': ('payment_date', 'created_at', 'updated_at')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'status', 'starts_at', 'expires_at', 'payment')
+    list_filter = ('status', 'expires_at')
+    search_fields = ('user__username', 'user__email', 'payment__transaction_id')
+    raw_id_fields = ('user', 'payment')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,108 @@
+# payment, entitlements.py:
+# who may read premium content.
+# - staff always, anonymous never
+# - CustomUser.is_subscribed is the first gate (no query, a token claim with StatelessJWTAuthentication)
+# - then the user's latest active Subscription.expires_at, kept in an in-process cache for ENTITLEMENT_CACHE_TTL
+#   seconds. only grants are cached, and the cached expiry is still compared with the clock, so a lapsed
+#   subscription is refused the moment it expires even before the sweeper clears is_subscribed.
+#   grant_subscription and the expire_subscriptions sweeper forget their users; a subscription revoked by other
+#   means (admin, raw UPDATE) may still be honoured by other processes for up to the TTL.
+# - users flagged is_subscribed without any Subscription row (granted in the admin, or paid before
+#   subscriptions existed) keep access until staff untick the flag.
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from .models import Subscription
+
+MANUAL_GRANT = "manual"  # cached value for users subscribed by flag only
+MAX_ENTRIES = 10000
+
+
+class EntitlementCache:
+    """user id -> (expires_at or MANUAL_GRANT, cached until monotonic time), per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, user_id, value, ttl):
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[user_id] = (value, time.monotonic() + ttl)
+
+    def forget(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = EntitlementCache()
+
+
+def subscription_days():
+    return getattr(settings, "SUBSCRIPTION_DAYS", 30)
+
+
+def load_entitlement(user_id):
+    """expires_at of the user's latest active subscription, MANUAL_GRANT if the user never had one, else None."""
+    row = Subscription.objects.filter(user_id=user_id).aggregate(
+        expires_at=Max("expires_at", filter=Q(status=Subscription.ACTIVE)),
+        total=Count("pk"),
+    )
+    if not row["total"]:
+        return MANUAL_GRANT
+    return row["expires_at"]
+
+
+def has_premium_access(user):
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    if not user.is_subscribed:
+        return False
+
+    entitlement = cache.get(user.pk)
+    if entitlement is None:
+        entitlement = load_entitlement(user.pk)
+        if entitlement is None:
+            return False  # lapsed, not cached: the sweeper clears the flag soon and no query is needed after that
+        cache.set(user.pk, entitlement, getattr(settings, "ENTITLEMENT_CACHE_TTL", 300))
+    return entitlement == MANUAL_GRANT or entitlement > timezone.now()
+
+
+def grant_subscription(user, payment, now=None):
+    """
+    Subscription for a successful payment, idempotent per payment.
+    A user who is still subscribed gets the new period appended to the current one.
+    """
+    now = now or timezone.now()
+    existing = Subscription.objects.filter(payment=payment).first()
+    if existing is not None:
+        return existing, False
+
+    current_end = (
+        Subscription.objects.filter(user=user, status=Subscription.ACTIVE, expires_at__gt=now)
+        .aggregate(end=Max("expires_at"))["end"]
+    )
+    starts_at = current_end or now
+    subscription = Subscription.objects.create(
+        user=user, payment=payment, starts_at=starts_at,
+        expires_at=starts_at + timedelta(days=subscription_days()),
+    )
+    cache.forget([user.pk])
+    return subscription, True
@@ -0,0 +1,244 @@
+# payment, gateway.py:
+# SSLCommerz client shared by every request of the process.
+# - one requests.Session with a keep-alive connection pool, no TLS handshake per initiate_payment
+# - connect / read timeouts, a slow gateway can no longer hold a web worker indefinitely
+# - circuit breaker, after FAILURE_THRESHOLD consecutive failures calls fail fast for RESET_TIMEOUT seconds
+# - latency metrics, staff report at /api/v1/payment/gateway/stats/
+# - pluggable transport, FakeTransport answers locally for tests and benchmarks (manage.py benchmark_gateway)
+#
+# settings.PAYMENT_GATEWAY = {
+#     'TRANSPORT': 'payment.gateway.RequestsTransport',
+#     'CONNECT_TIMEOUT': 3.05,
+#     'READ_TIMEOUT': 10,
+#     'POOL_MAXSIZE': 10,
+#     'FAILURE_THRESHOLD': 5,
+#     'RESET_TIMEOUT': 30,
+# }
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "TRANSPORT": "payment.gateway.RequestsTransport",
+    "CONNECT_TIMEOUT": 3.05,
+    "READ_TIMEOUT": 10,
+    "POOL_MAXSIZE": 10,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30,
+}
+
+
+class GatewayError(Exception):
+    """The gateway call failed (network error, timeout, bad response)."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit is open, the call was not attempted."""
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "PAYMENT_GATEWAY", {})}
+
+
+class RequestsTransport:
+    """HTTP transport over one pooled keep-alive session."""
+
+    def __init__(self, connect_timeout, read_timeout, pool_maxsize=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=0)  # no silent retries, the breaker decides
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url, data):
+        import requests
+
+        try:
+            response = self.session.post(url, data=data, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise GatewayError(f"{type(e).__name__}: {e}") from e
+
+
+class FakeTransport:
+    """
+    Local stand-in for SSLCommerz, no network. Records every call.
+    `latency` seconds are slept per call, `fail` (an exception) is raised to simulate an outage.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, pool_maxsize=None, latency=0.0, fail=None):
+        self.latency = latency
+        self.fail = fail
+        self.calls = []
+
+    def post(self, url, data):
+        self.calls.append((url, dict(data)))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise GatewayError(str(self.fail))
+        return {
+            "status": "SUCCESS",
+            "sessionkey": f"FAKE{len(self.calls)}",
+            "GatewayPageURL": f"https://sandbox.sslcommerz.com/fake/{data.get('tran_id', '')}",
+        }
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures, one trial call (half open) after `reset_timeout`."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def end_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()  # (re)open, a failed trial call restarts the wait
+
+
+class LatencyStats:
+    """Call counters and latency percentiles over the last `window` calls, kept in process memory."""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = self.errors = self.rejected = 0
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(not ok)
+            self._latencies.append(seconds)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"calls": self.calls, "errors": self.errors, "rejected": self.rejected}
+
+        def pct(p):
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+        stats.update(p50_ms=pct(0.50), p95_ms=pct(0.95), p99_ms=pct(0.99),
+                     max_ms=round(latencies[-1] * 1000, 2) if latencies else None)
+        return stats
+
+
+class SSLCommerzGateway:
+    """The createSession call of sslcommerz_lib.SSLCOMMERZ, over a reusable transport."""
+
+    def __init__(self, store_id, store_pass, sandbox, transport, breaker=None, stats=None):
+        self.store_id = store_id
+        self.store_pass = store_pass
+        mode = "sandbox" if sandbox else "securepay"
+        self.create_session_url = f"https://{mode}.sslcommerz.com/gwprocess/v4/api.php"
+        self.transport = transport
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = stats or LatencyStats()
+
+    def create_session(self, post_body):
+        """Returns the gateway's response dict, raises GatewayUnavailable / GatewayError."""
+        if not self.breaker.allow():
+            self.stats.record_rejected()
+            raise GatewayUnavailable("payment gateway circuit is open")
+
+        data = {**post_body, "store_id": self.store_id, "store_passwd": self.store_pass}
+        started = time.perf_counter()
+        try:
+            response = self.transport.post(self.create_session_url, data)
+        except Exception:  # any transport error counts, not just GatewayError
+            self.stats.record(time.perf_counter() - started, ok=False)
+            self.breaker.record_failure()
+            raise
+        else:
+            self.stats.record(time.perf_counter() - started, ok=True)
+            self.breaker.record_success()
+        finally:
+            # a trial cut short without a verdict (KeyboardInterrupt, SystemExit, GeneratorExit) must not hold the
+            # half-open slot forever, nor count as a gateway failure
+            self.breaker.end_trial()
+        return response
+
+    def get_stats(self):
+        return {**self.stats.summary(), "circuit": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+def build_gateway(transport=None):
+    config = get_config()
+    if transport is None:
+        transport = import_string(config["TRANSPORT"])(
+            config["CONNECT_TIMEOUT"], config["READ_TIMEOUT"], config["POOL_MAXSIZE"]
+        )
+    return SSLCommerzGateway(
+        store_id=getattr(settings, "SSLCOMMERZ_STORE_ID", "anupc68bfa8f415e23"),
+        store_pass=getattr(settings, "SSLCOMMERZ_STORE_PASS", "anupc68bfa8f415e23@ssl"),
+        sandbox=getattr(settings, "SSLCOMMERZ_SANDBOX", True),
+        transport=transport,
+        breaker=CircuitBreaker(config["FAILURE_THRESHOLD"], config["RESET_TIMEOUT"]),
+    )
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process wide gateway, built on first use so its session and breaker are shared by all requests."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Swap the process wide gateway (tests, benchmarks), None rebuilds it from settings on next use."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
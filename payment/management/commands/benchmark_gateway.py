@@ -0,0 +1,95 @@
+# payment/management/commands/benchmark_gateway.py
+# run from project root: python manage.py benchmark_gateway [--calls 200] [--concurrency 8] [--latency 0.02]
+# starts a local fake SSLCommerz (http://127.0.0.1, no outside network) and compares
+# a new connection per call (old initiate_payment) with the pooled keep-alive client of payment/gateway.py,
+# then makes the fake gateway hang to show read timeouts and the circuit breaker failing fast.
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import requests
+from django.core.management.base import BaseCommand
+from payment.gateway import CircuitBreaker, GatewayError, RequestsTransport, SSLCommerzGateway
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes, avoid delayed-ACK stalls
+
+    def do_POST(self):
+        data = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+        time.sleep(self.server.delay)
+        body = json.dumps({
+            "status": "SUCCESS",
+            "GatewayPageURL": f"http://127.0.0.1/pay/{data.get('tran_id', [''])[0]}",
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):  # client already gave up (read timeout)
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the pooled payment gateway client against a local fake gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.02, help='Fake gateway processing time, seconds')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGatewayHandler)
+        server.daemon_threads = True
+        server.delay = options['latency']
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/gwprocess/v4/api.php"
+        calls, concurrency = options['calls'], options['concurrency']
+
+        def body(i):
+            return {"tran_id": f"bench_{i}", "total_amount": 100, "currency": "BDT"}
+
+        try:
+            # old path: module level requests.post, new TCP connection per call, no timeout
+            seconds = self._run(calls, concurrency, lambda i: requests.post(url, data=body(i)).json())
+            self._report("new connection per call", calls, seconds)
+
+            gateway = SSLCommerzGateway("store", "pass", True, RequestsTransport(3.05, 10, pool_maxsize=concurrency))
+            gateway.create_session_url = url
+            seconds = self._run(calls, concurrency, lambda i: gateway.create_session(body(i)))
+            self._report("pooled keep-alive client", calls, seconds)
+            self.stdout.write(f"  client stats: {gateway.get_stats()}")
+
+            # gateway hangs: every call is cut at the read timeout until the breaker opens, then rejected at once
+            server.delay = 1.0
+            gateway = SSLCommerzGateway("store", "pass", True, RequestsTransport(0.5, 0.2), breaker=CircuitBreaker(5, 30))
+            gateway.create_session_url = url
+            started = time.perf_counter()
+            for i in range(20):
+                try:
+                    gateway.create_session(body(i))
+                except GatewayError:
+                    pass
+            self.stdout.write(f"hung gateway: 20 calls in {time.perf_counter() - started:.2f}s "
+                              f"(read timeout 0.2s, gateway delay 1s) {gateway.get_stats()}")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _run(self, calls, concurrency, call):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, range(calls)))
+        return time.perf_counter() - started
+
+    def _report(self, label, calls, seconds):
+        self.stdout.write(f"{label}: {calls} calls in {seconds:.3f}s ({calls / seconds:.0f} calls/s, "
+                          f"{seconds / calls * 1000:.2f} ms per call)")
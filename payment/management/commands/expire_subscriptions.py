@@ -0,0 +1,50 @@
+# payment/management/commands/expire_subscriptions.py
+# run from project root: python manage.py expire_subscriptions [--batch-size 1000] [--dry-run]
+# marks lapsed subscriptions expired and clears is_subscribed on users left without an active one.
+# works in batches of bulk UPDATEs (status, expires_at index), no per-user save(), safe to run from cron.
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from payment.entitlements import cache as entitlement_cache
+from payment.models import Subscription
+from users.authentication import forget_auth_versions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Expire lapsed subscriptions and unsubscribe their users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count lapsed subscriptions')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        lapsed = Subscription.objects.filter(status=Subscription.ACTIVE, expires_at__lte=now)
+        if options['dry_run']:
+            self.stdout.write(f"{lapsed.count()} lapsed subscription(s)")
+            return
+
+        expired = unsubscribed = 0
+        while True:
+            with transaction.atomic():
+                rows = list(lapsed.order_by('expires_at', 'pk').values_list('pk', 'user_id')[:options['batch_size']])
+                if not rows:
+                    break
+                user_ids = {user_id for _, user_id in rows}
+                expired += Subscription.objects.filter(pk__in=[pk for pk, _ in rows]).update(status=Subscription.EXPIRED)
+
+                # renewed users keep the flag, auth_version bump makes their issued token claims stale
+                still_active = Subscription.objects.filter(user=OuterRef('pk'), status=Subscription.ACTIVE, expires_at__gt=now)
+                unsubscribed += (
+                    User.objects.filter(pk__in=user_ids, is_subscribed=True)
+                    .filter(~Exists(still_active))
+                    .update(is_subscribed=False, auth_version=F('auth_version') + 1)
+                )
+            forget_auth_versions(user_ids)
+            entitlement_cache.forget(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} subscription(s), unsubscribed {unsubscribed} user(s)"))
@@ -32,3 +32,43 @@ class Payment(models.Model):
     
     def __str__(self):
         return f"Payment {self.transaction_id} by {self.user.username}"
+
+
+class Subscription(models.Model):
+    """
+    Premium access bought by a Payment, valid from starts_at until expires_at.
+    CustomUser.is_subscribed stays as a denormalized flag: set by payment_success, cleared by the
+    expire_subscriptions sweeper once no active subscription is left.
+    """
+    ACTIVE = 'active'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = (
+        (ACTIVE, 'Active'),
+        (EXPIRED, 'Expired'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='subscriptions'
+    )
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,  # blank for subscriptions granted by staff
+        related_name='subscription'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ACTIVE)
+    starts_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-expires_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='subscription_status_exp_idx'), # sweeper: active and lapsed
+            models.Index(fields=['user', '-expires_at'], name='subscription_user_exp_idx'), # entitlement lookup
+        ]
+
+    def __str__(self):
+        return f"Subscription of {self.user_id} until {self.expires_at:%Y-%m-%d}"
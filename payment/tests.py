@@ -1,3 +1,238 @@
-from django.test import TestCase
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .entitlements import cache as entitlement_cache, grant_subscription, has_premium_access
+from .gateway import CircuitBreaker, FakeTransport, GatewayError, SSLCommerzGateway, set_gateway
+from .models import Payment, Subscription
+
+User = get_user_model()
+
+CALLBACK_URL = '/api/v1/payment/success/'
+INITIATE_URL = '/api/v1/payment/initiate/'
+
+
+def make_user():
+    return User.objects.create_user(username='payer', email='payer@example.com', password='pass12345')
+
+
+class PaymentSuccessIdempotencyTests(TestCase):
+
+    def test_duplicate_callback_records_one_payment(self):
+        user = make_user()
+        tran_id = f"{user.id}_abc123"
+        client = APIClient()
+        for _ in range(3):
+            response = client.post(CALLBACK_URL, {'tran_id': tran_id, 'amount': '500.00'})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Payment.objects.filter(transaction_id=tran_id).count(), 1)
+        user.refresh_from_db()
+        self.assertTrue(user.is_subscribed)
+        self.assertEqual(Subscription.objects.filter(user=user).count(), 1)
+
+    def test_pending_payment_is_upgraded(self):
+        user = make_user()
+        tran_id = f"{user.id}_pending1"
+        Payment.objects.create(user=user, transaction_id=tran_id, amount=500, status='pending')
+        response = APIClient().post(CALLBACK_URL, {'tran_id': tran_id, 'amount': '500.00'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Payment.objects.get(transaction_id=tran_id).status, 'success')
+
+    def test_unknown_user_is_rejected(self):
+        response = APIClient().post(CALLBACK_URL, {'tran_id': '999999_nope', 'amount': '500.00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class PaymentSuccessConcurrencyTests(TransactionTestCase):
+    """Parallel gateway retries, needs a database with row locks (postgres)."""
+
+    def test_parallel_callbacks_record_one_payment(self):
+        user = make_user()
+        tran_id = f"{user.id}_parallel1"
+
+        def callback(_):
+            try:
+                return APIClient().post(CALLBACK_URL, {'tran_id': tran_id, 'amount': '500.00'}).status_code
+            finally:
+                connection.close()  # each worker thread has its own connection
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(callback, range(8)))
+
+        self.assertEqual(statuses, [302] * 8)
+        self.assertEqual(Payment.objects.filter(transaction_id=tran_id).count(), 1)
+        user.refresh_from_db()
+        self.assertTrue(user.is_subscribed)
+
+
+class InitiatePaymentGatewayTests(TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.gateway = SSLCommerzGateway('store', 'pass', True, self.transport, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        set_gateway(self.gateway)
+        self.addCleanup(set_gateway, None)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user())
+
+    def test_returns_gateway_url(self):
+        response = self.client.post(INITIATE_URL, {'amount': 500})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/fake/', response.data['payment_url'])
+        url, data = self.transport.calls[0]
+        self.assertEqual(data['store_id'], 'store')
+
+    def test_circuit_opens_after_failures(self):
+        self.transport.fail = GatewayError('timed out')
+        self.assertEqual(self.client.post(INITIATE_URL, {'amount': 500}).status_code, 502)
+        self.assertEqual(self.client.post(INITIATE_URL, {'amount': 500}).status_code, 502)
+        self.assertEqual(self.client.post(INITIATE_URL, {'amount': 500}).status_code, 503)
+        self.assertEqual(len(self.transport.calls), 2)  # the third call never reached the gateway
+        self.assertEqual(self.gateway.get_stats()['rejected'], 1)
+
+
+class EntitlementTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        entitlement_cache.clear()
+
+    def pay(self, tran_id):
+        return Payment.objects.create(user=self.user, transaction_id=tran_id, amount=500, status='success')
+
+    def subscribe(self):
+        self.user.is_subscribed = True
+        self.user.save()
+
+    def test_grant_is_idempotent_and_extends_the_current_period(self):
+        now = timezone.now()
+        payment = self.pay(f"{self.user.id}_a")
+        first, created = grant_subscription(self.user, payment, now=now)
+        self.assertTrue(created)
+        self.assertEqual(grant_subscription(self.user, payment, now=now), (first, False))
+
+        second, _ = grant_subscription(self.user, self.pay(f"{self.user.id}_b"), now=now + timedelta(days=1))
+        self.assertEqual(second.starts_at, first.expires_at)  # renewed early, the new period is appended
+        self.assertEqual(second.expires_at, first.expires_at + timedelta(days=30))
+
+    def test_access_follows_the_subscription(self):
+        self.subscribe()
+        subscription, _ = grant_subscription(self.user, self.pay(f"{self.user.id}_a"))
+        self.assertTrue(has_premium_access(self.user))
+
+        with mock.patch("payment.entitlements.timezone.now", return_value=subscription.expires_at + timedelta(seconds=1)):
+            self.assertFalse(has_premium_access(self.user))  # lapsed, refused before the sweeper runs, cached or not
+
+    def test_grant_is_cached_per_process(self):
+        self.subscribe()
+        subscription, _ = grant_subscription(self.user, self.pay(f"{self.user.id}_a"))
+        self.assertTrue(has_premium_access(self.user))
+        with self.assertNumQueries(0):
+            self.assertTrue(has_premium_access(self.user))
+
+        Subscription.objects.filter(pk=subscription.pk).update(status=Subscription.EXPIRED)
+        self.assertTrue(has_premium_access(self.user))  # revoked behind the cache's back, honoured until the TTL
+        with override_settings(ENTITLEMENT_CACHE_TTL=0):
+            entitlement_cache.clear()
+            self.assertFalse(has_premium_access(self.user))
+
+    def test_grant_forgets_the_cached_entitlement(self):
+        self.subscribe()
+        self.assertTrue(has_premium_access(self.user))  # cached as a manual grant
+        grant_subscription(self.user, self.pay(f"{self.user.id}_a"))
+        with self.assertNumQueries(1):
+            self.assertTrue(has_premium_access(self.user))
+
+    def test_gates_without_a_subscription(self):
+        self.assertFalse(has_premium_access(AnonymousUser()))
+        self.assertFalse(has_premium_access(self.user))
+        self.subscribe()
+        self.assertTrue(has_premium_access(self.user))  # flagged by staff, no Subscription row
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass12345', is_staff=True)
+        self.assertTrue(has_premium_access(staff))
+
+    def test_sweeper_unsubscribes_lapsed_users(self):
+        self.subscribe()
+        subscription, _ = grant_subscription(self.user, self.pay(f"{self.user.id}_a"))
+        Subscription.objects.filter(pk=subscription.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        entitlement_cache.set(self.user.pk, timezone.now() + timedelta(days=1), ttl=300)  # as cached before it lapsed
+        call_command('expire_subscriptions', stdout=StringIO())
+        self.assertIsNone(entitlement_cache.get(self.user.pk))
+        subscription.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((subscription.status, self.user.is_subscribed), (Subscription.EXPIRED, False))
+
+
+class CircuitBreakerTests(TestCase):
+
+    def test_unexpected_error_is_recorded_and_ends_the_trial(self):
+        transport = FakeTransport()
+        gateway = SSLCommerzGateway('store', 'pass', True, transport, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+        transport.post = lambda url, data: {}['GatewayPageURL']  # a bug, not a GatewayError
+        with self.assertRaises(KeyError):
+            gateway.create_session({'tran_id': 't1'})
+        self.assertEqual(gateway.get_stats()['errors'], 1)
+        self.assertEqual(gateway.breaker.state, 'half_open')  # reset_timeout=0
+
+        with self.assertRaises(KeyError):
+            gateway.create_session({'tran_id': 't2'})  # the half-open trial fails the same way
+        self.assertFalse(gateway.breaker._trial_running)
+
+        del transport.post  # back to the working fake
+        self.assertEqual(gateway.create_session({'tran_id': 't3'})['status'], 'SUCCESS')
+        self.assertEqual(gateway.breaker.state, 'closed')
+
+    def test_interrupt_is_not_a_failure_and_frees_the_trial(self):
+        transport = FakeTransport()
+        gateway = SSLCommerzGateway('store', 'pass', True, transport, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+        gateway.breaker.record_failure()  # open, half open at once with reset_timeout=0
+
+        def interrupted(url, data):
+            raise KeyboardInterrupt
+        transport.post = interrupted
+        with self.assertRaises(KeyboardInterrupt):
+            gateway.create_session({'tran_id': 't1'})
+        self.assertEqual((gateway.get_stats()['errors'], gateway.breaker.failures), (0, 1))
+        self.assertFalse(gateway.breaker._trial_running)
+
+        del transport.post
+        self.assertEqual(gateway.create_session({'tran_id': 't2'})['status'], 'SUCCESS')  # the next trial is allowed
+        self.assertEqual(gateway.breaker.state, 'closed')
+
+
+class PaymentExportTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        Payment.objects.create(user=self.user, transaction_id=f"{self.user.id}_export", amount="500.00", status="success")
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/v1/payments/export/').status_code, 403)
+
+    def test_streams_ndjson_and_rejects_unknown_output(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.user.refresh_from_db()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/payments/export/')
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [(row["transaction_id"], row["user__username"], row["amount"]) for row in rows],
+            [(f"{self.user.id}_export", "payer", "500.00")],
+        )
+        self.assertEqual(client.get('/api/v1/payments/export/', {'output': 'xml'}).status_code, 400)
@@ -6,14 +6,19 @@ import uuid
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, HttpResponseRedirect
-from sslcommerz_lib import SSLCOMMERZ 
 from datetime import datetime
 from rest_framework.decorators import api_view, action
 import os
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 from .models import Payment
+from .entitlements import grant_subscription
 from .serializers import PaymentSerializer
+from .gateway import GatewayError, GatewayUnavailable, get_gateway
+from core.query_budget import QueryBudgetMixin
+from core.export import OUTPUTS as EXPORT_OUTPUTS, OUTPUT_PARAM as EXPORT_OUTPUT_PARAM, stream_export
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 import logging
 from django.contrib.auth import get_user_model
 
@@ -37,7 +42,7 @@ class IsOwnerOrStaff(permissions.BasePermission):
         # Write permissions are only allowed to the staff.
         return request.user.is_staff
     
-class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing payments.
     - Staff users can see all payments.
@@ -45,6 +50,8 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
+    export_fields = ("id", "transaction_id", "user_id", "user__username", "amount", "status", "payment_date", "created_at", "updated_at")
     
     def get_queryset(self):
         # Check if this is a schema generation request
@@ -53,9 +60,10 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             return Payment.objects.none()
             
         user = self.request.user
+        queryset = Payment.objects.select_related('user') # username in PaymentSerializer
         if user.is_staff:
-            return Payment.objects.all()
-        return Payment.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
     
     def retrieve(self, request, *args, **kwargs):
         """
@@ -86,14 +94,33 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             # Return an empty response for schema generation
             return Response({})
             
-        payments = Payment.objects.filter(user=request.user)
+        payments = Payment.objects.select_related('user').filter(user=request.user)
         serializer = self.get_serializer(payments, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        operation_description="Stream every payment as NDJSON or CSV, staff only",
+        manual_parameters=[openapi.Parameter('output', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=EXPORT_OUTPUTS, default='ndjson')],
+        responses={200: "NDJSON or CSV file"}
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Streamed dump for analytics, values() rows from a server-side cursor (core/export.py)
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Response({})
+
+        output = request.query_params.get(EXPORT_OUTPUT_PARAM, 'ndjson')
+        if output not in EXPORT_OUTPUTS:
+            return Response({"detail": f"'{EXPORT_OUTPUT_PARAM}' must be one of: {', '.join(EXPORT_OUTPUTS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        return stream_export(Payment.objects.order_by('pk'), self.export_fields, output, 'payments')
+
 """
 List All Payments: GET /api/v1/payments/
 Get Payment by Transaction ID: GET /api/v1/payments/{transaction_id}/
 Get Current User's Payments (Custom Action): GET /api/v1/payments/my_payments/
+Export All Payments, staff only (Custom Action): GET /api/v1/payments/export/?output=ndjson|csv
 """
 
 
@@ -108,9 +135,10 @@ class PaymentListAPIView(generics.ListAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Payment.objects.select_related('user')
         if user.is_staff:
-            return Payment.objects.all()
-        return Payment.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
 
 class PaymentDetailAPIView(generics.RetrieveAPIView):
     """
@@ -120,7 +148,7 @@ class PaymentDetailAPIView(generics.RetrieveAPIView):
     """
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrStaff]
-    queryset = Payment.objects.all()
+    queryset = Payment.objects.select_related('user')
     lookup_field = 'transaction_id'    
     
 
@@ -150,20 +178,6 @@ def initiate_payment(request):
     unique_id = uuid.uuid4().hex
     tran_id = f"{user.id}_{unique_id}"
 
-    # prepare SSLCommerz config from environment or settings
-    sslcommerz_settings = {
-        'store_id': getattr(settings, 'SSLCOMMERZ_STORE_ID', 'anupc68bfa8f415e23'),
-        'store_pass': getattr(settings, 'SSLCOMMERZ_STORE_PASS', 'anupc68bfa8f415e23@ssl'),
-        'issandbox': getattr(settings, 'SSLCOMMERZ_SANDBOX', True)
-    }
-
-    # create instance
-    try:
-        sslcz = SSLCOMMERZ(sslcommerz_settings)
-    except Exception as e:
-        logger.exception("Failed to initialize SSLCOMMERZ")
-        return Response({"error": "Payment gateway initialization failed"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
     # safe getter for user attributes (avoid AttributeError)
     def _safe(u, attr, default=""):
         return getattr(u, attr, default) or default
@@ -191,11 +205,14 @@ def initiate_payment(request):
         'product_profile': "general",
     }
 
-    # Call createSession inside try/except and log full response
+    # shared pooled client (payment/gateway.py): bounded by timeouts, fails fast while the circuit is open
     try:
-        response = sslcz.createSession(post_body)
-    except Exception:
-        logger.exception("sslcommerz.createSession failed for tran_id=%s post_body=%s", tran_id, post_body)
+        response = get_gateway().create_session(post_body)
+    except GatewayUnavailable:
+        logger.warning("payment gateway circuit open, rejected tran_id=%s", tran_id)
+        return Response({"error": "Payment gateway temporarily unavailable, please retry shortly"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except GatewayError:
+        logger.exception("sslcommerz createSession failed for tran_id=%s", tran_id)
         return Response({"error": "Payment gateway session creation failed"}, status=status.HTTP_502_BAD_GATEWAY)
 
     # Defensive checks on response dict
@@ -218,6 +235,51 @@ def initiate_payment(request):
 
 
 
+def record_successful_payment(tran_id, amount):
+    """
+    Idempotent: subscribe the user encoded in tran_id, upsert the Payment row and its Subscription, in one transaction.
+    The user row is locked (SELECT ... FOR UPDATE), so parallel callbacks for a transaction run one after another
+    and every one after the first finds the payment already recorded. Returns (payment, created).
+    """
+    user_id = tran_id.split('_')[0]
+    with transaction.atomic():
+        user = User.objects.select_for_update().only('id', 'is_subscribed', 'auth_version').get(id=user_id)
+        payment = Payment.objects.filter(transaction_id=tran_id).first()
+        if payment is not None and payment.status == 'success':
+            return payment, False
+
+        if not user.is_subscribed:
+            user.is_subscribed = True
+            user.save(update_fields=['is_subscribed'])
+
+        created = False
+        if payment is None:
+            try:
+                with transaction.atomic():  # savepoint, a racing insert for the same tran_id must not abort the outer transaction
+                    payment = Payment.objects.create(
+                        user=user,
+                        transaction_id=tran_id,
+                        amount=amount or 0,
+                        status='success',
+                        payment_date=timezone.now()
+                    )
+                created = True
+            except IntegrityError:
+                payment = Payment.objects.get(transaction_id=tran_id)
+                if payment.status == 'success':
+                    return payment, False
+
+        if not created:
+            # an earlier pending/failed row for this transaction, upgrade it
+            payment.status = 'success'
+            payment.amount = amount or payment.amount
+            payment.payment_date = timezone.now()
+            payment.save(update_fields=['status', 'amount', 'payment_date', 'updated_at'])
+
+        grant_subscription(user, payment)
+        return payment, created
+
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -235,30 +297,25 @@ def payment_success(request):
     if not tran_id:
         return JsonResponse({"error": "missing tran_id"}, status=400)
 
-    # Try to find user based on tran_id if your tran_id encodes user id
+    success_redirect = HttpResponseRedirect(f"{settings.FRONTEND_URL.rstrip('/')}/payment/success")
+
+    # gateway retries and the /payment/success/ redirect path can deliver the same callback twice,
+    # a processed transaction short-circuits on the unique transaction_id index
+    if Payment.objects.filter(transaction_id=tran_id, status='success').exists():
+        logger.info("payment_success duplicate callback for tran_id=%s, already processed", tran_id)
+        return success_redirect
+
     try:
-        user_id = tran_id.split('_')[0]
-        user = User.objects.get(id=user_id)
-    except Exception:
+        record_successful_payment(tran_id, total_amount)
+    except (User.DoesNotExist, ValueError):
         logger.exception("Failed to find user for tran_id=%s", tran_id)
         return JsonResponse({"error": "failed to find user for transaction id"}, status=400)
-
-    try:
-        user.is_subscribed = True
-        user.save()
-        payment = Payment.objects.create(
-            user=user,
-            transaction_id=tran_id,
-            amount=total_amount or 0,
-            status='success',
-            payment_date=timezone.now()
-        )
     except Exception:
         logger.exception("Failed to create payment record for tran_id=%s", tran_id)
         return JsonResponse({"error":"payment processing failed"}, status=500)
 
     # return either redirect (if gateway follows) or JSON
-    return HttpResponseRedirect(f"{settings.FRONTEND_URL.rstrip('/')}/payment/success")
+    return success_redirect
 
 @csrf_exempt
 @api_view(['POST'])
@@ -275,4 +332,12 @@ def payment_fail(request):
 def payment_cancel(request):
     logger.info("payment_cancel called payload=%s", request.data)
     # handle cancel
-    return HttpResponseRedirect(f"{settings.FRONTEND_URL.rstrip('/')}/payment/cancel")
\ No newline at end of file
+    return HttpResponseRedirect(f"{settings.FRONTEND_URL.rstrip('/')}/payment/cancel")
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def gateway_stats(request):
+    """
+    GET /api/v1/payment/gateway/stats/ - gateway call counts, latency percentiles and circuit state (this process only).
+    """
+    return Response(get_gateway().get_stats())
@@ -0,0 +1,86 @@
+# users, authentication.py:
+# optional stateless JWT authentication. access tokens carry a compact claim set (CLAIM_NAMES, stamped at issue
+# time by users/serializers.py), requests are authenticated from the token alone and the user row is only loaded
+# when code asks for something the claims do not have.
+# - staleness/revocation: tokens also carry CustomUser.auth_version, bumped whenever username, is_staff,
+#   is_subscribed, is_active or password change, by save() and by bulk QuerySet.update() (users/models.py).
+#   the current version is read from the cache (one key per user, AUTH_VERSION_CACHE_TTL seconds, then one indexed
+#   single-column SELECT). a stale access token is rejected with 401, the client refreshes it (the refresh
+#   serializer stamps current claims, and the normal lookup there rejects inactive or deleted users).
+# enable with JWT_AUTHENTICATION_CLASS=users.authentication.StatelessJWTAuthentication
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+CLAIM_NAMES = ("username", "is_staff", "is_subscribed", "is_active")
+AUTH_VERSION_CLAIM = "auth_version"
+
+
+def add_user_claims(token, user):
+    """Embed the claim set and the user's auth_version in `token` (access or refresh)."""
+    for name in CLAIM_NAMES:
+        token[name] = getattr(user, name)
+    token[AUTH_VERSION_CLAIM] = user.auth_version
+    return token
+
+
+def _version_key(user_id):
+    return f"authver:{user_id}"
+
+
+def _cache():
+    return caches[getattr(settings, "AUTH_VERSION_CACHE_ALIAS", "default")]
+
+
+def remember_auth_version(user_id, version):
+    """Store the current version right after it changes, None when the user is gone."""
+    _cache().set(_version_key(user_id), -1 if version is None else version, getattr(settings, "AUTH_VERSION_CACHE_TTL", 60))
+
+
+def forget_auth_versions(user_ids):
+    """Drop cached versions after a bulk UPDATE bumped auth_version in the db."""
+    _cache().delete_many([_version_key(user_id) for user_id in user_ids])
+
+
+def current_auth_version(user_id):
+    """auth_version of the user, -1 if the user does not exist."""
+    version = _cache().get(_version_key(user_id))
+    if version is None:
+        version = get_user_model().objects.filter(pk=user_id).values_list("auth_version", flat=True).first()
+        remember_auth_version(user_id, version)
+        version = -1 if version is None else version
+    return version
+
+
+def user_from_claims(token):
+    """
+    CustomUser built from the token claims, no query. id, username, is_staff, is_subscribed, is_active and
+    auth_version come from the token, every other field is deferred and the first access to one loads them all.
+    Built like a row read from the db (not adding), so a save() writes only the fields that were loaded or set.
+    """
+    User = get_user_model()
+    claims = {name: token[name] for name in CLAIM_NAMES}
+    claims[User._meta.pk.attname] = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])  # the claim is a string
+    claims[AUTH_VERSION_CLAIM] = token[AUTH_VERSION_CLAIM]
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in claims]  # from_db wants model order
+    return User.from_db(router.db_for_read(User), names, [claims[name] for name in names])
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts current claims instead of loading the user on every request."""
+
+    def get_user(self, validated_token):
+        if AUTH_VERSION_CLAIM not in validated_token or any(name not in validated_token for name in CLAIM_NAMES):
+            return super().get_user(validated_token)  # token issued before claims were added
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if validated_token[AUTH_VERSION_CLAIM] != current_auth_version(user_id):
+            # password, is_staff, is_subscribed or is_active changed (or the user is gone) since the token was issued
+            raise AuthenticationFailed(_("Token claims are out of date, refresh the token."), code="token_stale")
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user_from_claims(validated_token)
@@ -12,3 +12,23 @@ class CustomEmailBackend(SMTPBackend):
                 self.ssl_context.verify_flags &= ~ssl.VERIFY_X509_STRICT
             except AttributeError:
                 pass  # VERIFY_X509_STRICT not available, no action needed
+
+
+# queued backend: the request only writes the message to core.QueuedEmail and returns,
+# `python manage.py send_queued_email` delivers it later through QUEUED_EMAIL_DELIVERY_BACKEND.
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        from core.email_queue import to_row
+        from core.models import QueuedEmail
+        if not email_messages:
+            return 0
+        try:
+            QueuedEmail.objects.bulk_create([to_row(message) for message in email_messages])
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(email_messages)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_is_subscribed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='auth_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,10 +1,13 @@
 # users, models.py:
 
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from functools import partial
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import F
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from cloudinary.models import CloudinaryField  # for image save in cloud
+from core.tracking import NOT_LOADED, TrackedFieldsMixin
 
 PHONE_REGEX = RegexValidator(
     regex=r'^\+?1?\d{3,15}$',
@@ -16,7 +19,28 @@ def validate_image_size(image):
     if image and image.size > max_kb * 1024:
         raise ValidationError(f"Image file too large ( > {max_kb}KB )")
 
-class CustomUser(AbstractUser):
+# fields whose change makes the claims embedded in issued access tokens stale (users/authentication.py)
+AUTH_CLAIM_FIELDS = ("username", "is_staff", "is_subscribed", "is_active", "password")
+
+class CustomUserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """A bulk UPDATE of any AUTH_CLAIM_FIELDS (e.g. is_active=False from the admin) also bumps auth_version."""
+        if "auth_version" in kwargs or not set(kwargs) & set(AUTH_CLAIM_FIELDS):
+            return super().update(**kwargs)
+        from .authentication import forget_auth_versions
+        user_ids = list(self.values_list("pk", flat=True))
+        count = super(CustomUserQuerySet, self.filter(pk__in=user_ids)).update(auth_version=F("auth_version") + 1, **kwargs)
+        forget_auth_versions(user_ids)
+        transaction.on_commit(partial(forget_auth_versions, user_ids))  # again, a read before commit may have cached the old version
+        return count
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
+class CustomUser(TrackedFieldsMixin, AbstractUser):
+    tracked_fields = ("profile_picture",) + AUTH_CLAIM_FIELDS # lets save()/pre_save spot changes without re-reading the row
     is_active = models.BooleanField(default=False) # activate by email, djoser
     phone_number = models.CharField(max_length=20, validators=[PHONE_REGEX], blank=True, null=True)
     location = models.CharField(max_length=100, blank=True, help_text="City or location (e.g., Dhaka)")
@@ -24,6 +48,9 @@ class CustomUser(AbstractUser):
     #profile_picture = models.ImageField(upload_to='blog-ink_avatars/', validators=[validate_image_size], blank=True, null=True) # latter use claudinary field
     profile_picture = CloudinaryField('image', folder='blog-ink_avatars', blank=True, null=True,)  # to save image in cloud, default='blog-ink_avatars/default_img.png'
     is_subscribed = models.BooleanField(default=False) # has user bought subscription field
+    auth_version = models.PositiveIntegerField(default=0, editable=False) # bumped when AUTH_CLAIM_FIELDS change, token claims carry it
+
+    objects = CustomUserManager()
     
     def save(self, *args, **kwargs):
         if not self.pk:  # only for new users
@@ -31,8 +58,32 @@ class CustomUser(AbstractUser):
                 self.is_active = True  # superusers are active by default
             else:
                 self.is_active = False  # set True by activation email for regular users
+        elif self.auth_claims_changed(kwargs.get("update_fields")):
+            self.auth_version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "auth_version"}
         super().save(*args, **kwargs)
 
+    def auth_claims_changed(self, update_fields=None):
+        """True if this save writes a new value to any of AUTH_CLAIM_FIELDS."""
+        for name in AUTH_CLAIM_FIELDS:
+            if update_fields is not None and name not in update_fields:
+                continue
+            if name not in self.__dict__: # deferred and untouched, not written
+                continue
+            old = self.get_loaded_value(name)
+            if old is NOT_LOADED or old != self.__dict__[name]:
+                return True
+        return False
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # first access to a deferred field loads every deferred field in one SELECT, not one query per field
+        # (users built from token claims, users/authentication.py, have everything but the claims deferred)
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
     def __str__(self):
         return self.username
     
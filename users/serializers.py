@@ -3,6 +3,9 @@ from rest_framework import serializers
 from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import CLAIM_NAMES, add_user_claims
 from .models import CustomUser
 MAX_IMAGE_KB = 500
 
@@ -75,4 +78,23 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         else:
             user = CustomUser.objects.create_user(**user_kwargs, password=password)
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login (token/ and auth/jwt/create/), stamps the user claims read by StatelessJWTAuthentication."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh, re-stamps current claims on the new access token so a refresh picks up e.g. a new subscription."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = self.token_class.access_token_class(data["access"])
+        user = CustomUser.objects.filter(pk=access[jwt_settings.USER_ID_CLAIM]).only("id", *CLAIM_NAMES, "auth_version").first()
+        if user is not None:
+            data["access"] = str(add_user_claims(access, user))
+        return data
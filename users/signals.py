@@ -1,32 +1,53 @@
 # users, signals.py:
 # delete profile avatar image on user delete or avatar update.
+# keep the cached auth_version (users/authentication.py) current.
 
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from cloudinary.uploader import destroy
+from core.image_cleanup import public_id_of, queue_image_deletion
+from core.tracking import NOT_LOADED
+from .authentication import remember_auth_version
 from .models import CustomUser
 
 
 @receiver(post_delete, sender=CustomUser)
 def delete_avatar_on_user_delete(sender, instance, **kwargs):
-    """Remove Cloudinary avatar when the user is deleted."""
+    """Queue the Cloudinary avatar for deletion when the user is deleted."""
     if instance.profile_picture:
-        destroy(instance.profile_picture.public_id)
+        queue_image_deletion(instance.profile_picture.public_id)
 
 
 @receiver(pre_save, sender=CustomUser)
-def delete_old_avatar_on_avatar_update(sender, instance, **kwargs):
-    """Remove the previous Cloudinary avatar when the field is replaced."""
+def remember_replaced_avatar(sender, instance, update_fields=None, **kwargs):
+    """Note the previous Cloudinary avatar when the field is replaced, deleted after the save (below)."""
+    instance._replaced_avatar_id = None
     if not instance.pk: # new user
         return
-
-    try:
-        old_user = CustomUser.objects.get(pk=instance.pk)
-    except CustomUser.DoesNotExist:
+    if update_fields is not None and "profile_picture" not in update_fields: # e.g. last_login, is_subscribed
         return
 
-    old_pic = old_user.profile_picture
-    new_pic = instance.profile_picture
+    old_pic = instance.get_loaded_value("profile_picture") # snapshot taken when the user was loaded, no extra query
+    if old_pic is NOT_LOADED: # built by hand or field deferred, fall back to the db
+        old_pic = CustomUser.objects.filter(pk=instance.pk).values_list("profile_picture", flat=True).first()
+
+    old_id = public_id_of(old_pic)
+    if old_id and old_id != public_id_of(instance.profile_picture):
+        instance._replaced_avatar_id = old_id
+
+
+@receiver(post_save, sender=CustomUser)
+def delete_old_avatar_on_avatar_update(sender, instance, **kwargs):
+    """Queue the replaced avatar only after the save went through (queued on commit)."""
+    queue_image_deletion(instance.__dict__.pop("_replaced_avatar_id", None))
+
+
+@receiver(post_save, sender=CustomUser)
+def cache_auth_version(sender, instance, created, update_fields=None, **kwargs):
+    """Stale access tokens are noticed immediately, not after AUTH_VERSION_CACHE_TTL."""
+    if not created and (update_fields is None or "auth_version" in update_fields):
+        remember_auth_version(instance.pk, instance.auth_version)
 
-    if old_pic and old_pic != new_pic:
-        destroy(old_pic.public_id)		
\ No newline at end of file
+
+@receiver(post_delete, sender=CustomUser)
+def forget_auth_version_on_user_delete(sender, instance, **kwargs):
+    remember_auth_version(instance.pk, None)
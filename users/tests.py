@@ -1,3 +1,104 @@
-from django.test import TestCase
+from cloudinary import CloudinaryResource
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from core.models import OrphanedImage
+from .authentication import StatelessJWTAuthentication
+from .models import CustomUser
+
+
+def make_user(username='reader', **fields):
+    return CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password='pass12345', **fields)
+
+
+class AvatarCleanupTests(TestCase):
+
+    def test_replaced_avatar_is_queued_after_commit(self):
+        user = make_user(profile_picture=CloudinaryResource(public_id='avatars/old', type='upload', resource_type='image'))
+        user = CustomUser.objects.get(pk=user.pk)
+        user.profile_picture = CloudinaryResource(public_id='avatars/new', type='upload', resource_type='image')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(list(OrphanedImage.objects.values_list('public_id', flat=True)), ['avatars/old'])
+
+    def test_last_login_update_queues_nothing(self):
+        user = make_user(profile_picture=CloudinaryResource(public_id='avatars/old', type='upload', resource_type='image'))
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['last_login'])
+        self.assertFalse(OrphanedImage.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StatelessJWTAuthenticationTests(TestCase):
+    """Tokens come from POST /api/v1/token/ (ClaimsTokenObtainPairSerializer)."""
+
+    def setUp(self):
+        caches['default'].clear()  # cached auth versions of users from other tests
+        self.user = make_user(is_staff=True)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.user.refresh_from_db()
+        self.access = self.obtain_access()
+
+    def obtain_access(self):
+        response = APIClient().post('/api/v1/token/', {'username': 'reader', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    def authenticate(self, access=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access or self.access}')
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_user_is_built_from_claims_without_a_query(self):
+        with self.assertNumQueries(1):  # the auth_version check, cached afterwards
+            user, _ = self.authenticate()
+        self.assertIs(type(user), CustomUser)
+        self.assertEqual((user.pk, user.username, user.is_staff, user.is_active), (self.user.pk, 'reader', True, True))
+        with self.assertNumQueries(0):
+            self.authenticate()
+        with self.assertNumQueries(1):  # every deferred field in one SELECT
+            self.assertEqual((user.email, user.bio, user.location), ('reader@example.com', '', ''))
+
+    def test_claim_changes_revoke_the_token(self):
+        changes = {
+            'password': lambda user: user.set_password('pass12345'),  # same password, new hash
+            'is_staff': lambda user: setattr(user, 'is_staff', False),
+            'is_subscribed': lambda user: setattr(user, 'is_subscribed', True),
+        }
+        for name, change in changes.items():
+            with self.subTest(name):
+                access = self.obtain_access()
+                self.authenticate(access)
+                user = CustomUser.objects.get(pk=self.user.pk)
+                change(user)
+                user.save()
+                with self.assertRaises(AuthenticationFailed):
+                    self.authenticate(access)
+
+    def test_stale_token_gets_401_and_refresh_restamps_claims(self):
+        client = APIClient()
+        tokens = client.post('/api/v1/token/', {'username': 'reader', 'password': 'pass12345'}).data
+        CustomUser.objects.filter(pk=self.user.pk).update(is_subscribed=True)  # bulk update, no save()
+
+        with self.assertRaises(AuthenticationFailed) as caught:
+            self.authenticate(tokens['access'])
+        self.assertEqual(caught.exception.status_code, 401)
+
+        access = client.post('/api/v1/token/refresh/', {'refresh': tokens['refresh']}).data['access']
+        user, _ = self.authenticate(access)
+        self.assertTrue(user.is_subscribed)
+
+    def test_bulk_deactivation_rejects_the_token(self):
+        self.authenticate()
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_inactive_user_is_rejected(self):
+        self.authenticate()
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
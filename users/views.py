@@ -1,8 +1,14 @@
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import CustomUser
 from .serializers import CustomUserSerializer
+from core.query_budget import QueryBudgetMixin
+from blogs.models import AuthorStats
+from blogs.serializers import AuthorStatsSerializer
 
 class IsStaffOrReadOnlyForAuthenticated(permissions.BasePermission):
     """
@@ -20,10 +26,11 @@ class IsStaffOrReadOnlyForAuthenticated(permissions.BasePermission):
                          "Authenticated users can list and view active users. "
                          "Staff users have full CRUD access to all users."
 )
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [IsStaffOrReadOnlyForAuthenticated]
+    query_budget = 5
     
     @swagger_auto_schema(
         operation_summary="List users",
@@ -81,6 +88,34 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return qs
         return qs.filter(is_active=True)  # filter out inactive users for non-staff
+
+    @swagger_auto_schema(
+        operation_summary="Author statistics",
+        operation_description="GET /api/v1/users/{id}/stats/ - active posts, likes and comments received, latest post. "
+                              "Read from the precomputed AuthorStats row.",
+        responses={200: AuthorStatsSerializer, 404: "User not found"}
+    )
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, pk=None):
+        """One query on the AuthorStats row (with the latest post title), no scan of posts, likes or comments."""
+        if getattr(self, 'swagger_fake_view', False):
+            return Response({})
+
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound("User not found.")
+        users = self.get_queryset().filter(pk=pk)
+        stats = (
+            AuthorStats.objects.filter(user__in=users)
+            .select_related("latest_post").defer("latest_post__body", "latest_post__search_vector") # only the title is shown
+            .first()
+        )
+        if stats is None:
+            if not users.exists():
+                raise NotFound("User not found.")
+            stats = AuthorStats(user_id=pk) # never wrote a post, all zeros
+        return Response(AuthorStatsSerializer(stats).data)
     
 
 """